@@ -1,7 +1,15 @@
 from flask import Flask
+from app.config import OLLAMA_WARMUP, MERGE_SWEEP_INTERVAL
 from app.routes import main  # ← important!
+from app.utils.analyze import REVIEW_SYSTEM_PROMPT
+from app.utils.llm import start_warmup
+from app.utils.sweeper import merge_sweeper
 
 def create_app():
     app = Flask(__name__)
     app.register_blueprint(main)
+    if OLLAMA_WARMUP:
+        start_warmup(REVIEW_SYSTEM_PROMPT)
+    if MERGE_SWEEP_INTERVAL > 0:
+        merge_sweeper.start()
     return app
@@ -1,21 +1,139 @@
 import os
+import json
 import logging
-from github import Github
+from app.utils.github_client import GitHubClients
 
 GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 ORG_NAME = os.getenv("ORG_NAME", "stormyy00")
 REPO_NAME = os.getenv("REPO_NAME", "email-automation")
 DISCORD_WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL")
 
-def repo():
+# Repositories served: an explicit list and/or every repository of an org.
+# ORG_NAME/REPO_NAME stays the default for requests that don't name a repo.
+DEFAULT_REPO = f"{ORG_NAME}/{REPO_NAME}"
+GITHUB_REPOS = [r.strip() for r in os.getenv("GITHUB_REPOS", DEFAULT_REPO).split(",") if r.strip()]
+GITHUB_ORG = os.getenv("GITHUB_ORG")
+
+# Discord notifications are posted in batches from a background queue
+DISCORD_QUEUE_SIZE = int(os.getenv("DISCORD_QUEUE_SIZE", 100))
+DISCORD_TIMEOUT = float(os.getenv("DISCORD_TIMEOUT", 10))
+DISCORD_BATCH_WINDOW = float(os.getenv("DISCORD_BATCH_WINDOW", 1.0))
+
+# Shared GitHub client (one pooled HTTP session, cached repository handles)
+GITHUB_API_URL = os.getenv("GITHUB_API_URL", "https://api.github.com")
+GITHUB_POOL_SIZE = int(os.getenv("GITHUB_POOL_SIZE", 10))
+GITHUB_REPO_TTL = int(os.getenv("GITHUB_REPO_TTL", 300))
+# PyGithub spaces every request 0.25s apart by default, which serializes concurrent lookups
+GITHUB_SECONDS_BETWEEN_REQUESTS = float(os.getenv("GITHUB_SECONDS_BETWEEN_REQUESTS", 0))
+# Spacing of merges and other writes, per GitHub's secondary rate limit guidance (GraphQL queries aren't throttled)
+GITHUB_SECONDS_BETWEEN_WRITES = float(os.getenv("GITHUB_SECONDS_BETWEEN_WRITES", 1.0))
+# GET responses kept for ETag revalidation (0 disables conditional requests)
+GITHUB_ETAG_CACHE_SIZE = int(os.getenv("GITHUB_ETAG_CACHE_SIZE", 2000))
+# Total body size of those responses; PR file lists and diffs can be megabytes each
+GITHUB_ETAG_CACHE_BYTES = int(os.getenv("GITHUB_ETAG_CACHE_BYTES", 64 * 1024 * 1024))
+
+# Background review jobs (webhook reviews run off the request thread)
+REVIEW_WORKERS = int(os.getenv("REVIEW_WORKERS", 2))
+REVIEW_QUEUE_SIZE = int(os.getenv("REVIEW_QUEUE_SIZE", 100))
+REVIEW_JOB_HISTORY = int(os.getenv("REVIEW_JOB_HISTORY", 500))
+# Queued jobs allowed per repository, so one busy repo can't fill the whole queue
+REVIEW_QUEUE_SIZE_PER_REPO = int(os.getenv("REVIEW_QUEUE_SIZE_PER_REPO", REVIEW_QUEUE_SIZE))
+
+# ASGI serving (SERVER_MODE=asgi): thread pools the Flask routes run on; review and
+# merge requests get their own pool so they can't starve health checks and listings
+SERVER_MODE = os.getenv("SERVER_MODE", "wsgi").lower()
+ASGI_FAST_WORKERS = int(os.getenv("ASGI_FAST_WORKERS", 16))
+ASGI_SLOW_WORKERS = int(os.getenv("ASGI_SLOW_WORKERS", 8))
+
+# Webhook delivery IDs remembered to drop GitHub redeliveries
+WEBHOOK_DELIVERY_TTL = int(os.getenv("WEBHOOK_DELIVERY_TTL", 24 * 3600))
+WEBHOOK_DELIVERY_MAX = int(os.getenv("WEBHOOK_DELIVERY_MAX", 10000))
+
+# Threads used to run the pre-merge gate lookups concurrently
+MERGE_GATE_WORKERS = int(os.getenv("MERGE_GATE_WORKERS", 5))
+# Seconds between background sweeps that auto-merge every eligible open PR (0 disables the sweeper)
+MERGE_SWEEP_INTERVAL = int(os.getenv("MERGE_SWEEP_INTERVAL", 0))
+
+# Ollama models to use, in order of preference, and how long the model catalog is trusted
+OLLAMA_MODELS = [m.strip() for m in os.getenv("OLLAMA_MODELS", "llama3.2").split(",") if m.strip()]
+OLLAMA_MODEL_TTL = int(os.getenv("OLLAMA_MODEL_TTL", 300))
+# Ollama generations allowed at once; further calls queue by priority
+LLM_CONCURRENCY = int(os.getenv("LLM_CONCURRENCY", 2))
+# Bulk reviews (/api/review-prs): reviews run at once, and PRs fetched ahead of the review stage
+BULK_REVIEW_PARALLELISM = int(os.getenv("BULK_REVIEW_PARALLELISM", LLM_CONCURRENCY))
+BULK_REVIEW_PREFETCH = int(os.getenv("BULK_REVIEW_PREFETCH", 8))
+
+
+def _keep_alive(value):
+    # Ollama takes a duration string ("30m") or seconds, with -1 meaning never unload
+    try:
+        return float(value) if "." in value else int(value)
+    except ValueError:
+        return value
+
+
+# How long Ollama keeps the model loaded after a call, and whether to load it at startup
+OLLAMA_KEEP_ALIVE = _keep_alive(os.getenv("OLLAMA_KEEP_ALIVE", "30m"))
+OLLAMA_WARMUP = os.getenv("OLLAMA_WARMUP", "true").lower() in ("1", "true", "yes")
+# Per-model Ollama options as JSON, keyed by model name or name without tag, e.g.
+# {"llama3.2": {"num_ctx": 16384, "num_predict": 768}}; unset options fall back to the REVIEW_* settings
+OLLAMA_MODEL_OPTIONS = json.loads(os.getenv("OLLAMA_MODEL_OPTIONS") or "{}")
+
+# Context window the review prompt is packed into and the reply length (sent to Ollama as num_ctx and num_predict)
+REVIEW_NUM_CTX = int(os.getenv("REVIEW_NUM_CTX", 8192))
+REVIEW_RESPONSE_TOKENS = int(os.getenv("REVIEW_RESPONSE_TOKENS", 1024))
+REVIEW_MIN_DIFF_TOKENS = int(os.getenv("REVIEW_MIN_DIFF_TOKENS", 1024))
+
+# Map-reduce mode for PRs whose diff doesn't fit one prompt: review file chunks in parallel, then merge
+REVIEW_MAP_REDUCE = os.getenv("REVIEW_MAP_REDUCE", "true").lower() in ("1", "true", "yes")
+REVIEW_CHUNK_TOKENS = int(os.getenv("REVIEW_CHUNK_TOKENS", REVIEW_NUM_CTX - REVIEW_RESPONSE_TOKENS - 512))
+REVIEW_MAP_PARALLELISM = int(os.getenv("REVIEW_MAP_PARALLELISM", 2))
+
+# Trivial-change rules answered without the model: docs-only, dependency bumps and version bumps.
+# Only PRs of up to FAST_PATH_MAX_FILES files are checked (one files-API page each).
+REVIEW_FAST_PATH = os.getenv("REVIEW_FAST_PATH", "true").lower() in ("1", "true", "yes")
+FAST_PATH_MAX_FILES = int(os.getenv("FAST_PATH_MAX_FILES", 30))
+FAST_PATH_VERSION_LINES = int(os.getenv("FAST_PATH_VERSION_LINES", 4))
+FAST_PATH_MANIFEST_LINES = int(os.getenv("FAST_PATH_MANIFEST_LINES", 20))
+
+# Review cache (reviews are reused until the PR head, model or prompt changes)
+REVIEW_CACHE_PATH = os.getenv("REVIEW_CACHE_PATH", "review_cache.db")
+REVIEW_CACHE_TTL = int(os.getenv("REVIEW_CACHE_TTL", 7 * 24 * 3600))
+REVIEW_CACHE_MAX_ENTRIES = int(os.getenv("REVIEW_CACHE_MAX_ENTRIES", 1000))
+
+# Review history: every generated review and merge decision, queried through /api/reviews and /api/merges
+REVIEW_HISTORY_PATH = os.getenv("REVIEW_HISTORY_PATH", "review_history.db")
+
+# In-memory PR state fed by webhooks; trusted for this many seconds without an update
+PR_STORE_TTL = int(os.getenv("PR_STORE_TTL", 900))
+
+github_clients = GitHubClients(
+    GITHUB_TOKEN, GITHUB_API_URL, GITHUB_POOL_SIZE, GITHUB_REPO_TTL, GITHUB_SECONDS_BETWEEN_REQUESTS,
+    GITHUB_ETAG_CACHE_SIZE, GITHUB_SECONDS_BETWEEN_WRITES, GITHUB_ETAG_CACHE_BYTES
+)
+
+def repositories():
+    names = list(GITHUB_REPOS)
+    if GITHUB_ORG:
+        try:
+            names += [name for name in github_clients.org_repos(GITHUB_ORG) if name not in names]
+        except Exception as e:
+            logging.error(f"❌ Failed to list repositories of {GITHUB_ORG}: {e}")
+    return names
+
+def is_served(full_name):
+    # Org membership is checked by name so webhooks don't need the org listing
+    if GITHUB_ORG and full_name.lower().startswith(f"{GITHUB_ORG.lower()}/"):
+        return True
+    return full_name.lower() in {name.lower() for name in GITHUB_REPOS}
+
+def repo(full_name=None):
     if not GITHUB_TOKEN:
         logging.error("❌ GITHUB_TOKEN is missing! Set it as an environment variable.")
         raise RuntimeError("GITHUB_TOKEN is missing")
 
     try:
-        github = Github(GITHUB_TOKEN)
-        repo = github.get_repo(f"{ORG_NAME}/{REPO_NAME}")
-        logging.info(f"✅ Connected to GitHub repo: {ORG_NAME}/{REPO_NAME}")
+        repo = github_clients.get_repo(full_name or DEFAULT_REPO)
     except Exception as e:
         logging.error(f"❌ Failed to connect to GitHub: {e}")
         raise RuntimeError(f"GitHub connection failed: {e}") 
@@ -2,5 +2,6 @@ from flask import jsonify
 
 
 class Health:
+    @staticmethod
     def health_check():
         return jsonify({"status": "healthy"})
\ No newline at end of file
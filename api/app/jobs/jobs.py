@@ -0,0 +1,15 @@
+from flask import jsonify
+from ..utils.jobs import review_jobs
+
+
+class Jobs:
+    @staticmethod
+    def get_job(job_id):
+        job = review_jobs.get(job_id)
+        if not job:
+            return jsonify({"error": f"Job {job_id} not found"}), 404
+        return jsonify(job), 200
+
+    @staticmethod
+    def queue_stats():
+        return jsonify(review_jobs.stats()), 200
@@ -1,20 +1,39 @@
 from flask import Flask, request, jsonify
-from app.config import repo
+from app.config import repo, DEFAULT_REPO, is_served
 from ..utils.analyze import analyze_pr
 from ..utils.automerge import auto_merge_pr
+from ..utils.llm import INTERACTIVE
+from ..utils.sweeper import merge_sweeper
 
 class Merge:
     @staticmethod
     def merge_pr(pr_number):
         try:
-            review = analyze_pr(pr_number)
-            success, message = auto_merge_pr(pr_number, review)
+            force = request.args.get("force", "").lower() in ("1", "true", "yes")
+            repo_name = request.args.get("repo") or DEFAULT_REPO
+            if not is_served(repo_name):
+                return jsonify({"error": f"Repository {repo_name} is not served"}), 404
+
+            # Fetch the PR once and share it between the review and the merge gates
+            pr = repo(repo_name).get_pull(pr_number)
+            review = analyze_pr(pr_number, force=force, pr=pr, repo_name=repo_name, priority=INTERACTIVE)
+            success, message, timings, _ = auto_merge_pr(pr_number, review, pr=pr, repo_name=repo_name)
 
             return jsonify({
+                "repo": repo_name,
                 "pr_number": pr_number,
                 "success": success,
                 "message": message,
-                "review": review
+                "review": review,
+                "timings": timings
             })
         except Exception as e:
-            return jsonify({"error": str(e)}), 500
\ No newline at end of file
+            return jsonify({"error": str(e)}), 500
+
+    # Run the background merge sweep now instead of waiting for the interval
+    @staticmethod
+    def sweep():
+        try:
+            return jsonify(merge_sweeper.sweep())
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
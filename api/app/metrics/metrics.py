@@ -0,0 +1,28 @@
+from flask import Response
+from app.config import github_clients
+from ..utils.metrics import registry
+from ..utils.jobs import review_jobs
+from ..utils.discord import discord_notifier
+from ..utils.prstore import pr_store
+
+
+def _rate_limit_remaining():
+    cache = github_clients.conditional_cache
+    if not cache:
+        return None
+    return {(resource,): limit["remaining"] for resource, limit in cache.stats()["rate_limit"].items()}
+
+
+# Point-in-time values read from the existing stats at scrape time
+registry.gauge("review_queue_depth", "Review jobs waiting for a worker", lambda: review_jobs.stats()["depth"])
+registry.gauge("review_workers_busy", "Review workers running a job", lambda: review_jobs.stats()["busy"])
+registry.gauge("discord_queue_depth", "Discord notifications waiting to be posted", lambda: discord_notifier.stats()["depth"])
+registry.gauge("pr_store_entries", "PRs held in the in-memory PR store", lambda: pr_store.stats()["prs"])
+registry.gauge("github_rate_limit_remaining", "GitHub API requests left in the current window", _rate_limit_remaining,
+               ("resource",))
+
+
+class Metrics:
+    @staticmethod
+    def export():
+        return Response(registry.render(), mimetype="text/plain; version=0.0.4")
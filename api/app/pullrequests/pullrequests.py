@@ -3,25 +3,72 @@ from flask import jsonify
 import logging
 import requests
 import json
+from concurrent.futures import ThreadPoolExecutor
 from github import Github
 from flask import Flask, request, jsonify
-from ..config import repo
+from ..config import repo, repositories, is_served, GITHUB_POOL_SIZE
+from ..utils.graphql import list_open_prs
+from ..utils.prstore import pr_store
+
+
+def open_prs(full_name):
+    # Webhooks keep the store current; only go to GitHub when it's cold or stale
+    prs = pr_store.list_open(full_name)
+    if prs is not None:
+        return prs
+
+    try:
+        prs = list_open_prs(full_name)
+    except Exception as e:
+        logging.warning(f"⚠️ GraphQL PR listing failed for {full_name}, falling back to REST: {e}")
+        pulls = repo(full_name).get_pulls(state="open")
+        logging.info(f"✅ Retrieved {pulls.totalCount} open PRs for {full_name}.")
+        prs = [{
+            "number": pr.number,
+            "title": pr.title,
+            "user": pr.user.login,
+            "created_at": pr.created_at.isoformat(),
+            "updated_at": pr.updated_at.isoformat(),
+            "mergeable": pr.mergeable
+        } for pr in pulls]
+
+    pr_store.bootstrap(full_name, prs)
+    return prs
 
 
 class PRS:
     @staticmethod
     def list_prs():
-        try:
-            pulls = repo().get_pulls(state="open")
-            logging.info(f"✅ Retrieved {pulls.totalCount} open PRs.")
-            return jsonify([{
-                "number": pr.number, 
-                "title": pr.title, 
-                "user": pr.user.login,
-                "created_at": pr.created_at.isoformat(),
-                "updated_at": pr.updated_at.isoformat(),
-                "mergeable": pr.mergeable
-            } for pr in pulls])
-        except Exception as e:
-            logging.error(f"❌ Error fetching PRs: {e}")
-            return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        full_name = request.args.get("repo")
+        if full_name:
+            if not is_served(full_name):
+                return jsonify({"error": f"Repository {full_name} is not served"}), 404
+            try:
+                return jsonify([{"repo": full_name, **pr} for pr in open_prs(full_name)])
+            except Exception as e:
+                logging.error(f"❌ Error fetching PRs: {e}")
+                return jsonify({"error": str(e)}), 500
+
+        # Aggregated listing: every served repo, fetched concurrently, newest first
+        names = repositories()
+
+        def fetch(name):
+            try:
+                return [{"repo": name, **pr} for pr in open_prs(name)], None
+            except Exception as e:
+                logging.error(f"❌ Error fetching PRs for {name}: {e}")
+                return [], e
+
+        with ThreadPoolExecutor(max_workers=max(1, min(GITHUB_POOL_SIZE, len(names)))) as pool:
+            results = list(pool.map(fetch, names))
+
+        errors = [{"repo": name, "error": str(error)} for name, (_, error) in zip(names, results) if error]
+        if names and len(errors) == len(names):
+            return jsonify({"error": errors[0]["error"], "errors": errors}), 500
+        prs = [pr for listed, _ in results for pr in listed]
+        response = jsonify(sorted(prs, key=lambda pr: pr["created_at"], reverse=True))
+        if errors:
+            # Some repositories are missing from the list; the body stays a plain list for existing clients
+            response.status_code = 207
+            response.headers["X-Listing-Errors"] = json.dumps(errors)
+        return response
@@ -4,16 +4,67 @@ import logging
 import requests
 import json
 from github import Github
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify, stream_with_context
 from app.utils.analyze import analyze_pr
+from app.utils.llm import INTERACTIVE
+from app.utils.stream import stream_review
+from app.utils.bulk import bulk_review
+from app.pullrequests.pullrequests import open_prs
+from app.config import DEFAULT_REPO, is_served
 
 class Review:
      @staticmethod
      def review_pr(pr_number):
         try:
-            review = analyze_pr(pr_number)
-            return jsonify({"pr_number": pr_number, "review": review})
+            force = request.args.get("force", "").lower() in ("1", "true", "yes")
+            repo_name = request.args.get("repo") or DEFAULT_REPO
+            if not is_served(repo_name):
+                return jsonify({"error": f"Repository {repo_name} is not served"}), 404
+            review = analyze_pr(pr_number, force=force, repo_name=repo_name, priority=INTERACTIVE)
+            return jsonify({"repo": repo_name, "pr_number": pr_number, "review": review})
         except Exception as e:
             logging.error(f"❌ Error analyzing PR #{pr_number}: {e}")
             return jsonify({"error": str(e)}), 500
 
+     @staticmethod
+     def stream_review_pr(pr_number):
+        force = request.args.get("force", "").lower() in ("1", "true", "yes")
+        repo_name = request.args.get("repo") or DEFAULT_REPO
+        if not is_served(repo_name):
+            return jsonify({"error": f"Repository {repo_name} is not served"}), 404
+        return Response(
+            stream_with_context(stream_review(pr_number, force=force, repo_name=repo_name)),
+            mimetype="text/event-stream",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
+
+     # Reviews the PRs listed in ?prs=1,2,3 (all open PRs when omitted) and streams
+     # one NDJSON line per PR as its review finishes, then a summary line
+     @staticmethod
+     def review_prs():
+        force = request.args.get("force", "").lower() in ("1", "true", "yes")
+        repo_name = request.args.get("repo") or DEFAULT_REPO
+        if not is_served(repo_name):
+            return jsonify({"error": f"Repository {repo_name} is not served"}), 404
+        try:
+            prs = request.args.get("prs", "all")
+            if prs == "all":
+                pr_numbers = [pr["number"] for pr in open_prs(repo_name)]
+            else:
+                pr_numbers = list(dict.fromkeys(int(number) for number in prs.split(",") if number.strip()))
+        except ValueError:
+            return jsonify({"error": "prs must be a comma-separated list of PR numbers or 'all'"}), 400
+        except Exception as e:
+            logging.error(f"❌ Error listing open PRs of {repo_name}: {e}")
+            return jsonify({"error": str(e)}), 500
+
+        try:
+            results = bulk_review(repo_name, pr_numbers, force=force, priority=INTERACTIVE)
+        except Exception as e:
+            logging.error(f"❌ Error starting bulk review of {repo_name}: {e}")
+            return jsonify({"error": str(e)}), 500
+        return Response(
+            stream_with_context(json.dumps(result) + "\n" for result in results),
+            mimetype="application/x-ndjson",
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+        )
@@ -0,0 +1,92 @@
+import logging
+from datetime import datetime, timezone
+from flask import request, jsonify
+from ..utils.history import review_history
+
+VERDICTS = ("safe", "needs_review")
+MAX_PER_PAGE = 100
+
+
+# ISO 8601 date or datetime from the query string as a UTC timestamp; naive values are taken as UTC
+def _timestamp(name):
+    value = request.args.get(name)
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _page():
+    page = request.args.get("page", 1, type=int)
+    per_page = request.args.get("per_page", 20, type=int)
+    if page < 1 or not 1 <= per_page <= MAX_PER_PAGE:
+        raise ValueError(f"page must be at least 1 and per_page between 1 and {MAX_PER_PAGE}")
+    return page, per_page
+
+
+def _listing(name, total, items, page, per_page):
+    return jsonify({name: items, "total": total, "page": page, "per_page": per_page})
+
+
+class Reviews:
+    @staticmethod
+    def list_reviews():
+        verdict = request.args.get("verdict")
+        try:
+            if verdict and verdict not in VERDICTS:
+                raise ValueError(f"verdict must be one of {', '.join(VERDICTS)}")
+            page, per_page = _page()
+            since, until = _timestamp("since"), _timestamp("until")
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        try:
+            total, reviews = review_history.reviews(
+                repo_name=request.args.get("repo"),
+                pr_number=request.args.get("pr", type=int),
+                author=request.args.get("author"),
+                verdict=verdict,
+                since=since,
+                until=until,
+                limit=per_page,
+                offset=(page - 1) * per_page,
+            )
+        except Exception as e:
+            logging.error(f"❌ Error querying review history: {e}")
+            return jsonify({"error": str(e)}), 500
+        return _listing("reviews", total, reviews, page, per_page)
+
+    @staticmethod
+    def get_review(review_id):
+        review = review_history.review(review_id)
+        if not review:
+            return jsonify({"error": f"Review {review_id} not found"}), 404
+        return jsonify(review)
+
+    @staticmethod
+    def list_merges():
+        merged = request.args.get("merged")
+        try:
+            if merged is not None and merged.lower() not in ("true", "false"):
+                raise ValueError("merged must be true or false")
+            page, per_page = _page()
+            since, until = _timestamp("since"), _timestamp("until")
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+
+        try:
+            total, merges = review_history.merges(
+                repo_name=request.args.get("repo"),
+                pr_number=request.args.get("pr", type=int),
+                merged=None if merged is None else merged.lower() == "true",
+                since=since,
+                until=until,
+                limit=per_page,
+                offset=(page - 1) * per_page,
+            )
+        except Exception as e:
+            logging.error(f"❌ Error querying merge history: {e}")
+            return jsonify({"error": str(e)}), 500
+        return _listing("merges", total, merges, page, per_page)
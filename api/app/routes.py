@@ -2,33 +2,95 @@
 routes.py specifies all the endpoints for the api
 """
 
-from flask import Blueprint
+import time
+from flask import Blueprint, g, request
 from app.health.health import Health
 from app.pullrequests.pullrequests import PRS
 from app.reviewpr.reviewpr import Review
 from app.mergepr.mergepr import Merge
 from app.webhook.webhook import Webhook
+from app.jobs.jobs import Jobs
+from app.reviews.reviews import Reviews
+from app.stats.stats import Stats
+from app.metrics.metrics import Metrics
+from app.utils.metrics import http_request_duration
 
 main = Blueprint("main", __name__)
 
 
+@main.before_request
+def start_timer():
+    g.request_started = time.perf_counter()
+
+# Streamed responses are timed up to the point their body starts
+@main.after_request
+def record_latency(response):
+    if "request_started" in g:
+        http_request_duration.observe(
+            time.perf_counter() - g.request_started,
+            method=request.method,
+            route=request.url_rule.rule if request.url_rule else "unmatched",
+            status=response.status_code,
+        )
+    return response
+
+
 @main.route("/health", methods=["GET"])
 def health():
     return Health().health_check(), 200
 
 @main.route("/api/pull-requests", methods=["GET"])
 def pullrequests():
-    return PRS().list_prs(), 200
+    return PRS().list_prs()
 
 @main.route("/api/review-pr/<int:pr_number>", methods=["GET"])
 def reviewpr(pr_number):
-    return Review().review_pr(pr_number), 200
+    return Review().review_pr(pr_number)
+
+@main.route("/api/review-pr/<int:pr_number>/stream", methods=["GET"])
+def streamreviewpr(pr_number):
+    return Review().stream_review_pr(pr_number)
+
+@main.route("/api/review-prs", methods=["GET"])
+def reviewprs():
+    return Review().review_prs()
 
 @main.route("/api/merge-pr/<int:pr_number>", methods=["POST"])
 def mergepr(pr_number):
-    return Merge().merge_pr(pr_number), 200
+    return Merge().merge_pr(pr_number)
+
+@main.route("/api/merge-sweep", methods=["POST"])
+def mergesweep():
+    return Merge().sweep()
 
 @main.route("/api/webhook", methods=["POST"])
 def webhook():
-    return Webhook().github_webhook(), 200
-    
\ No newline at end of file
+    return Webhook().github_webhook()
+
+@main.route("/api/jobs", methods=["GET"])
+def jobs():
+    return Jobs().queue_stats()
+
+@main.route("/api/jobs/<job_id>", methods=["GET"])
+def job(job_id):
+    return Jobs().get_job(job_id)
+
+@main.route("/api/reviews", methods=["GET"])
+def reviews():
+    return Reviews().list_reviews()
+
+@main.route("/api/reviews/<int:review_id>", methods=["GET"])
+def review(review_id):
+    return Reviews().get_review(review_id)
+
+@main.route("/api/merges", methods=["GET"])
+def merges():
+    return Reviews().list_merges()
+
+@main.route("/api/stats", methods=["GET"])
+def stats():
+    return Stats().service_stats()
+
+@main.route("/metrics", methods=["GET"])
+def metrics():
+    return Metrics().export()
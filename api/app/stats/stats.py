@@ -0,0 +1,35 @@
+from flask import jsonify
+from app.config import github_clients
+from ..utils.jobs import review_jobs
+from ..utils.review_cache import review_cache
+from ..utils.stream import stream_stats
+from ..utils.llm import model_resolver, llm_scheduler, model_starts
+from ..utils.mapreduce import mapreduce_stats
+from ..utils.discord import discord_notifier
+from ..utils.prstore import pr_store
+from ..utils.dedupe import review_flights, webhook_deliveries
+from ..utils.history import review_history
+from ..utils.fastpath import fast_path_stats
+from ..utils.sweeper import merge_sweeper
+
+
+class Stats:
+    @staticmethod
+    def service_stats():
+        return jsonify({
+            "github": github_clients.stats(),
+            "jobs": review_jobs.stats(),
+            "review_cache": review_cache.stats(),
+            "streaming": stream_stats.stats(),
+            "models": model_resolver.stats(),
+            "model_starts": model_starts.stats(),
+            "llm_scheduler": llm_scheduler.stats(),
+            "map_reduce": mapreduce_stats.stats(),
+            "fast_path": fast_path_stats.stats(),
+            "discord": discord_notifier.stats(),
+            "pr_store": pr_store.stats(),
+            "single_flight": review_flights.stats(),
+            "webhook_deliveries": webhook_deliveries.stats(),
+            "review_history": review_history.stats(),
+            "merge_sweeper": merge_sweeper.stats()
+        }), 200
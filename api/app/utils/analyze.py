@@ -1,120 +1,359 @@
 import logging
-import ollama
+import time
 from .discord import send_discord_notification
-from app.config import repo
-import os
-# Function to analyze PR code using Ollama (Llama 3.2)
+from .review_cache import review_cache, prompt_hash
+from .llm import model_resolver, chat, chat_messages, model_options, BACKGROUND
+from .diffpack import pack_diff, pack_diff_stream, estimate_tokens, estimate_pr_tokens
+from .diffstream import pr_files, load_pr_files
+from .mapreduce import map_reduce_review, MAP_REDUCE_PROMPT_HASH
+from .dedupe import review_flights
+from .history import review_history
+from .fastpath import classify, fast_path_review, fast_path_update, fast_path_stats, FAST_PATH_PROMPT_HASH, FAST_PATH_MODEL
+from .metrics import token_usage
+from app.config import repo, DEFAULT_REPO, REVIEW_RESPONSE_TOKENS, REVIEW_MIN_DIFF_TOKENS, REVIEW_MAP_REDUCE, REVIEW_FAST_PATH, FAST_PATH_MAX_FILES
 
-ORG_NAME = os.getenv("ORG_NAME", "stormyy00")
-REPO_NAME = os.getenv("REPO_NAME", "email-automation")
-
-def analyze_pr(pr_number):
-    try:
-        pr = repo().get_pull(pr_number)
-        logging.info(f"Successfully fetched PR #{pr_number}: {pr.title}")
-        
-        files = list(pr.get_files())  # Convert to list to handle iterator
-        logging.info(f"PR #{pr_number} has {len(files)} changed files")
-        
-        if not files:
-            logging.warning(f"⚠️ PR #{pr_number} has no file changes.")
-            return "No file changes detected in this PR."
-        
-        # Get actual diff content rather than just filenames
-        diff_content = ""
-        for file in files:
-            logging.info(f"File: {file.filename}, Has patch: {hasattr(file, 'patch')}, Patch length: {len(file.patch) if hasattr(file, 'patch') and file.patch else 0}")
-            diff_content += f"File: {file.filename}\n"
-            patch_content = file.patch if hasattr(file, 'patch') and file.patch else 'Binary file or no patch available'
-            
-            # Limit patch content size to prevent overloading Ollama
-            max_patch_length = 2000
-            if len(patch_content) > max_patch_length:
-                patch_content = patch_content[:max_patch_length] + "... [truncated]"
-                
-            diff_content += f"Changes: {patch_content}\n\n"
-        
-        # Limit overall diff size
-        max_diff_length = 15000
-        if len(diff_content) > max_diff_length:
-            diff_content = diff_content[:max_diff_length] + "\n\n... [additional changes truncated due to size]"
-        
-        logging.info(f"Collected diff content for PR #{pr_number} ({len(diff_content)} characters)")
-        
-        prompt = f"""
+# Instructions go in a fixed system message and the PR in the user message, so
+# every review starts with the same prefix and Ollama can reuse its evaluation
+REVIEW_SYSTEM_PROMPT = """
             You are an AI code reviewer analyzing GitHub pull requests.
             1. Identify significant logic changes.
             2. Summarize changes concisely in 100 words or less.
             3. Provide constructive feedback and highlight potential improvements.
             4. Assess if this PR is safe to merge automatically.
-            
-            PR Title: {pr.title}
-            PR Description: {pr.body if pr.body else 'No description provided'}
+        """
+PROMPT_TEMPLATE = """
+            PR Title: {title}
+            PR Description: {description}
             
             File Changes:
             {diff_content}
         """
-        
-        logging.info(f"Sending prompt to Ollama for PR #{pr_number}")
-        
-        try:
-            # Check if Ollama is available
-            model_list = ollama.list()
-            logging.info(f"Available models: {model_list}")
-            
-            # Use a model that's definitely available (if llama3.2 isn't)
-            model_to_use = "llama3.2"
-            if "llama3.2" not in str(model_list):
-                # Use the first available model
-                for model_info in model_list.get('models', []):
-                    model_to_use = model_info.get('name')
-                    if model_to_use:
-                        break
-                logging.info(f"llama3.2 not found, using {model_to_use} instead")
-            
-            # AI Review with Ollama
-            response = ollama.chat(
-                model=model_to_use,
-                messages=[{"role": "user", "content": prompt}],
-                options={"timeout": 120}  # 2 minute timeout
-            )
-            
-            if not response:
-                logging.error("Ollama returned empty response")
-                return "Error: Ollama returned empty response"
-                
-            logging.info(f"Received response from Ollama: {str(response)[:100]}...")
-            
-            if "message" not in response:
-                logging.error(f"Unexpected response format from Ollama: {response}")
-                return "Error: Unexpected response format from Ollama"
-                
-            review_content = response["message"]["content"]
+PROMPT_HASH = prompt_hash(REVIEW_SYSTEM_PROMPT + PROMPT_TEMPLATE)
+
+# Used on new pushes: the model sees only the commits since the last review
+INCREMENTAL_SYSTEM_PROMPT = """
+            You are an AI code reviewer updating your earlier review of a GitHub pull request after new commits were pushed.
+            1. Identify significant logic changes in the new commits.
+            2. Update the previous summary concisely in 100 words or less so it covers the whole PR.
+            3. Provide constructive feedback on the new changes and highlight potential improvements.
+            4. Assess if this PR is safe to merge automatically.
+        """
+INCREMENTAL_PROMPT_TEMPLATE = """
+            PR Title: {title}
+            PR Description: {description}
             
-            if not review_content:
-                logging.error("Ollama returned empty content")
-                return "Error: Ollama returned empty content"
-                
-            logging.info(f"✅ Generated review for PR #{pr_number}: {review_content[:100]}...")
+            Previous Review (at {base_sha}):
+            {previous_review}
             
-            # Send Discord notification about the review
-            send_discord_notification(
-                title=f"🔍 PR Review: #{pr_number} - {pr.title}",
-                description=f"AI review generated for PR #{pr_number}",
-                color=0x00AAFF,  # Blue
-                fields=[
-                    {"name": "Repository", "value": f"{ORG_NAME}/{REPO_NAME}", "inline": True},
-                    {"name": "Author", "value": pr.user.login, "inline": True},
-                    {"name": "Review", "value": review_content[:1000] + ("..." if len(review_content) > 1000 else "")}
-                ]
-            )
+            New Changes since {base_sha}:
+            {diff_content}
+        """
+INCREMENTAL_PROMPT_HASH = prompt_hash(INCREMENTAL_SYSTEM_PROMPT + INCREMENTAL_PROMPT_TEMPLATE)
+MAX_PREVIOUS_REVIEW_LENGTH = 3000
+
+# How each prompt template is labelled in the review history
+REVIEW_KINDS = {
+    PROMPT_HASH: "full", INCREMENTAL_PROMPT_HASH: "incremental", MAP_REDUCE_PROMPT_HASH: "map_reduce",
+    FAST_PATH_PROMPT_HASH: "fast_path",
+}
+
+# Reviews the trivial-change rules gave this head, whichever model is configured
+def fast_path_key(repo_name, pr_number, pr):
+    return review_cache.make_key(repo_name, pr_number, pr.head.sha, FAST_PATH_MODEL, FAST_PATH_PROMPT_HASH)
+
+# Run the PR's files through the trivial-change rules when enabled and the PR is small enough
+def check_fast_path(files):
+    if not REVIEW_FAST_PATH or len(files) > FAST_PATH_MAX_FILES:
+        return None
+    match = classify(files)
+    fast_path_stats.record(match[0] if match else None)
+    return match
+
+def lookup_cached_review(cache_key, pr_number, pr):
+    try:
+        cached_review = review_cache.get(cache_key)
+    except Exception as cache_err:
+        logging.warning(f"⚠️ Review cache lookup failed for PR #{pr_number}: {cache_err}")
+        return None
+    if cached_review is not None:
+        logging.info(f"✅ Using cached review for PR #{pr_number} at {pr.head.sha[:7]}")
+    return cached_review
+
+# Any stored review of this head and model: incremental, map-reduce and rule-based reviews cover the whole PR too
+def find_cached_review(repo_name, pr_number, pr, model):
+    keys = [review_cache.make_key(repo_name, pr_number, pr.head.sha, model, template_hash)
+            for template_hash in (PROMPT_HASH, INCREMENTAL_PROMPT_HASH, MAP_REDUCE_PROMPT_HASH)]
+    for key in keys + [fast_path_key(repo_name, pr_number, pr)]:
+        cached_review = lookup_cached_review(key, pr_number, pr)
+        if cached_review is not None:
+            return cached_review
+    return None
+
+# Tokens left for the diff in the model's context once the instructions, PR text and the reply are accounted for
+def diff_token_budget(model, *prompt_parts):
+    options = model_options(model)
+    response_tokens = options["num_predict"] if options["num_predict"] > 0 else REVIEW_RESPONSE_TOKENS
+    fixed = estimate_tokens("".join(prompt_parts))
+    return max(options["num_ctx"] - response_tokens - fixed, REVIEW_MIN_DIFF_TOKENS)
+
+# Pack the patches of the changed files into the model's context budget;
+# files is a list of file objects or a streamed diff from pr_files
+def build_diff_content(pr_number, files, budget_tokens):
+    packed = pack_diff(files, budget_tokens) if isinstance(files, list) else pack_diff_stream(files, budget_tokens)
+    diff_content = packed["content"]
+    
+    if packed["omitted"]:
+        logging.warning(f"⚠️ PR #{pr_number}: {len(packed['omitted'])} file(s) left out of the review to fit the context: {', '.join(packed['omitted'])}")
+        diff_content += f"... [{len(packed['omitted'])} file(s) omitted due to size: {', '.join(packed['omitted'])}]\n"
+    if packed["truncated"]:
+        logging.info(f"PR #{pr_number}: truncated {', '.join(packed['truncated'])}")
+    if not packed["complete"]:
+        logging.warning(f"⚠️ PR #{pr_number}: stopped reading the diff at the context budget")
+        diff_content += "... [remaining files not shown: the diff exceeds the context budget]\n"
+    
+    logging.info(f"Packed diff for PR #{pr_number}: {len(packed['included'])} full, {len(packed['truncated'])} truncated, {len(packed['omitted'])} omitted (~{packed['tokens']}/{budget_tokens} tokens)")
+    return diff_content
+
+# Build the review prompt (the user message) from the PR's changed files
+def build_prompt(pr_number, pr, files, model):
+    description = pr.body if pr.body else 'No description provided'
+    budget = diff_token_budget(model, REVIEW_SYSTEM_PROMPT, PROMPT_TEMPLATE, pr.title, description)
+    return PROMPT_TEMPLATE.format(
+        title=pr.title,
+        description=description,
+        diff_content=build_diff_content(pr_number, files, budget)
+    )
+
+# Cache a finished review, record it in the history and announce it on Discord
+def store_review(cache_key, repo_name, pr_number, pr, model, review_content, template_hash=PROMPT_HASH, latency=None, usage=None):
+    try:
+        review_cache.put(cache_key, repo_name, pr_number, pr.head.sha, model, template_hash, review_content)
+    except Exception as cache_err:
+        logging.warning(f"⚠️ Could not cache review for PR #{pr_number}: {cache_err}")
+
+    usage = usage or {}
+    try:
+        review_history.record_review(
+            repo_name, pr_number, pr.user.login, pr.title, pr.head.sha, model, REVIEW_KINDS.get(template_hash, "full"),
+            review_content, latency=round(latency, 3) if latency is not None else None,
+            prompt_tokens=usage.get("prompt_tokens"), eval_tokens=usage.get("eval_tokens")
+        )
+    except Exception as history_err:
+        logging.warning(f"⚠️ Could not record review of PR #{pr_number} in the history: {history_err}")
+    
+    # Send Discord notification about the review
+    send_discord_notification(
+        title=f"🔍 PR Review: #{pr_number} - {pr.title}",
+        description=f"AI review generated for PR #{pr_number}",
+        color=0x00AAFF,  # Blue
+        fields=[
+            {"name": "Repository", "value": repo_name, "inline": True},
+            {"name": "Author", "value": pr.user.login, "inline": True},
+            {"name": "Review", "value": review_content[:1000] + ("..." if len(review_content) > 1000 else "")}
+        ]
+    )
+
+# Run the prompt through Ollama, returning (review, None, token usage) or (None, error message, None)
+def generate_review(pr_number, model, prompt, priority=BACKGROUND, tenant=None, system=REVIEW_SYSTEM_PROMPT):
+    try:
+        # AI Review with Ollama
+        response = chat(
+            model=model,
+            messages=chat_messages(system, prompt),
+            options={"timeout": 120},  # 2 minute timeout
+            priority=priority,
+            tenant=tenant
+        )
+        
+        if not response:
+            logging.error("Ollama returned empty response")
+            return None, "Error: Ollama returned empty response", None
             
-            return review_content
+        logging.info(f"Received response from Ollama: {str(response)[:100]}...")
+        
+        if "message" not in response:
+            logging.error(f"Unexpected response format from Ollama: {response}")
+            return None, "Error: Unexpected response format from Ollama", None
             
-        except Exception as ollama_err:
-            logging.error(f"❌ Ollama error: {ollama_err}")
-            return f"Error with Ollama: {ollama_err}"
+        review_content = response["message"]["content"]
+        
+        if not review_content:
+            logging.error("Ollama returned empty content")
+            return None, "Error: Ollama returned empty content", None
             
+        logging.info(f"✅ Generated review for PR #{pr_number}: {review_content[:100]}...")
+        
+        return review_content, None, token_usage(response)
+        
+    except Exception as ollama_err:
+        logging.error(f"❌ Ollama error: {ollama_err}")
+        return None, f"Error with Ollama: {ollama_err}", None
+
+# Function to analyze PR code using Ollama (Llama 3.2); the diff is read here,
+# only as far as the prompt budget goes
+def analyze_pr(pr_number, force=False, pr=None, repo_name=None, priority=BACKGROUND):
+    try:
+        repo_name = repo_name or DEFAULT_REPO
+        if pr is None:
+            pr = repo(repo_name).get_pull(pr_number)
+        logging.info(f"Successfully fetched PR #{pr_number} of {repo_name}: {pr.title}")
+
+        # Webhook, dashboard and merge callers reviewing the same head share one run;
+        # forced reviews have their own, so they never get a cached review from a normal one
+        return review_flights.do((repo_name, pr_number, pr.head.sha, force), _review_pr, pr_number, pr, repo_name, force, priority)
+
     except Exception as e:
         logging.error(f"❌ Error analyzing PR #{pr_number}: {e}")
-        return f"Error analyzing PR: {e}"
\ No newline at end of file
+        return f"Error analyzing PR: {e}"
+
+def _review_pr(pr_number, pr, repo_name, force, priority):
+    # Ollama calls are queued fairly across repositories and PR authors
+    tenant = (repo_name, pr.user.login)
+
+    try:
+        model_to_use = model_resolver.resolve()
+    except Exception as ollama_err:
+        logging.error(f"❌ Ollama error: {ollama_err}")
+        return f"Error with Ollama: {ollama_err}"
+
+    # Reuse the stored review while the PR head, model and prompt are unchanged
+    cache_key = review_cache.make_key(repo_name, pr_number, pr.head.sha, model_to_use, PROMPT_HASH)
+    if not force:
+        cached_review = find_cached_review(repo_name, pr_number, pr, model_to_use)
+        if cached_review is not None:
+            return cached_review
+
+    logging.info(f"PR #{pr_number} has {pr.changed_files} changed files (+{pr.additions}/-{pr.deletions})")
+
+    if not pr.changed_files:
+        logging.warning(f"⚠️ PR #{pr_number} has no file changes.")
+        return "No file changes detected in this PR."
+
+    started = time.perf_counter()
+
+    # Docs-only, dependency and version bumps get a templated review instead of a model call.
+    # The file list comes from one files-API page and is reused for the prompt when they don't match.
+    files = None
+    if REVIEW_FAST_PATH and pr.changed_files <= FAST_PATH_MAX_FILES:
+        files = list(pr.get_files())
+        match = check_fast_path(files)
+        if match:
+            logging.info(f"✅ PR #{pr_number} matched the {match[0]} rule, skipping the model")
+            review_content = fast_path_review(match)
+            store_review(fast_path_key(repo_name, pr_number, pr), repo_name, pr_number, pr, FAST_PATH_MODEL, review_content,
+                         FAST_PATH_PROMPT_HASH, latency=time.perf_counter() - started)
+            return review_content
+
+    # Too big for one prompt: review chunks of files in parallel and merge the results
+    description = pr.body if pr.body else 'No description provided'
+    budget = diff_token_budget(model_to_use, REVIEW_SYSTEM_PROMPT, PROMPT_TEMPLATE, pr.title, description)
+    if REVIEW_MAP_REDUCE and pr.changed_files > 1 and estimate_pr_tokens(pr) > budget:
+        files = files if files is not None else load_pr_files(repo_name, pr)
+        review_content, error, usage = map_reduce_review(pr_number, pr, files, model_to_use, priority=priority, tenant=tenant)
+        if error:
+            return error
+
+        map_reduce_key = review_cache.make_key(repo_name, pr_number, pr.head.sha, model_to_use, MAP_REDUCE_PROMPT_HASH)
+        store_review(map_reduce_key, repo_name, pr_number, pr, model_to_use, review_content, MAP_REDUCE_PROMPT_HASH,
+                     latency=time.perf_counter() - started, usage=usage)
+        return review_content
+
+    # Fits one prompt: read the diff as a stream, only as far as the budget goes
+    prompt = build_prompt(pr_number, pr, files if files is not None else pr_files(repo_name, pr), model_to_use)
+
+    logging.info(f"Sending prompt to Ollama for PR #{pr_number}")
+
+    review_content, error, usage = generate_review(pr_number, model_to_use, prompt, priority, tenant)
+    if error:
+        return error
+
+    store_review(cache_key, repo_name, pr_number, pr, model_to_use, review_content,
+                 latency=time.perf_counter() - started, usage=usage)
+
+    return review_content
+
+# Re-review a PR after new pushes using only the diff since the last reviewed head
+def analyze_pr_incremental(pr_number, pr=None, repo_name=None, priority=BACKGROUND):
+    try:
+        repo_name = repo_name or DEFAULT_REPO
+        gh_repo = repo(repo_name)
+        if pr is None:
+            pr = gh_repo.get_pull(pr_number)
+
+        # Coalesces with a full review of the same head; falling back to one from here re-enters the flight
+        return review_flights.do((repo_name, pr_number, pr.head.sha, False), _review_pr_incremental, pr_number, pr, repo_name, gh_repo, priority)
+
+    except Exception as e:
+        logging.error(f"❌ Error re-reviewing PR #{pr_number}: {e}")
+        return f"Error analyzing PR: {e}"
+
+def _review_pr_incremental(pr_number, pr, repo_name, gh_repo, priority):
+    previous = review_cache.latest(repo_name, pr_number)
+    if previous is None or previous[0] == pr.head.sha:
+        logging.info(f"No earlier review of PR #{pr_number} to build on, running a full review")
+        return analyze_pr(pr_number, pr=pr, repo_name=repo_name, priority=priority)
+    base_sha, previous_review = previous
+
+    cached_review = lookup_cached_review(fast_path_key(repo_name, pr_number, pr), pr_number, pr)
+    if cached_review is not None:
+        return cached_review
+
+    try:
+        model_to_use = model_resolver.resolve()
+    except Exception as ollama_err:
+        logging.error(f"❌ Ollama error: {ollama_err}")
+        return f"Error with Ollama: {ollama_err}"
+
+    cache_key = review_cache.make_key(repo_name, pr_number, pr.head.sha, model_to_use, INCREMENTAL_PROMPT_HASH)
+    cached_review = lookup_cached_review(cache_key, pr_number, pr)
+    if cached_review is not None:
+        return cached_review
+
+    # A force-push can drop the reviewed commit from the branch, so fall back to a full review
+    try:
+        comparison = gh_repo.compare(base_sha, pr.head.sha)
+    except Exception as compare_err:
+        logging.warning(f"⚠️ Could not compare {base_sha[:7]}...{pr.head.sha[:7]} for PR #{pr_number}: {compare_err}")
+        return analyze_pr(pr_number, pr=pr, repo_name=repo_name, priority=priority)
+    if comparison.status != "ahead":
+        logging.info(f"PR #{pr_number} head is {comparison.status} of the last review, running a full review")
+        return analyze_pr(pr_number, pr=pr, repo_name=repo_name, priority=priority)
+
+    started = time.perf_counter()
+    files = comparison.files
+    logging.info(f"PR #{pr_number} has {comparison.total_commits} new commit(s) touching {len(files)} file(s) since {base_sha[:7]}")
+    if not files:
+        return previous_review
+
+    # Trivial new commits leave the earlier review standing
+    match = check_fast_path(files)
+    if match:
+        logging.info(f"✅ New commits on PR #{pr_number} matched the {match[0]} rule, keeping the previous review")
+        review_content = f"{previous_review}\n\n{fast_path_update(match, base_sha)}"
+        store_review(fast_path_key(repo_name, pr_number, pr), repo_name, pr_number, pr, FAST_PATH_MODEL, review_content,
+                     FAST_PATH_PROMPT_HASH, latency=time.perf_counter() - started)
+        return review_content
+
+    if len(previous_review) > MAX_PREVIOUS_REVIEW_LENGTH:
+        previous_review = previous_review[:MAX_PREVIOUS_REVIEW_LENGTH] + "... [truncated]"
+    description = pr.body if pr.body else 'No description provided'
+    budget = diff_token_budget(model_to_use, INCREMENTAL_SYSTEM_PROMPT, INCREMENTAL_PROMPT_TEMPLATE, pr.title, description, previous_review)
+    prompt = INCREMENTAL_PROMPT_TEMPLATE.format(
+        title=pr.title,
+        description=description,
+        base_sha=base_sha[:7],
+        previous_review=previous_review,
+        diff_content=build_diff_content(pr_number, files, budget)
+    )
+
+    logging.info(f"Sending incremental prompt to Ollama for PR #{pr_number} ({len(prompt)} characters)")
+
+    review_content, error, usage = generate_review(pr_number, model_to_use, prompt, priority, (repo_name, pr.user.login), INCREMENTAL_SYSTEM_PROMPT)
+    if error:
+        return error
+
+    store_review(cache_key, repo_name, pr_number, pr, model_to_use, review_content, INCREMENTAL_PROMPT_HASH,
+                 latency=time.perf_counter() - started, usage=usage)
+
+    return review_content
+
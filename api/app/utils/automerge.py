@@ -1,15 +1,111 @@
 from .discord import send_discord_notification
 import logging
-import os
-from app.config import repo
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from app.config import repo, DEFAULT_REPO, MERGE_GATE_WORKERS
+from .prstore import pr_store
+from .graphql import merge_state
+from .history import review_history, review_verdict
 
-ORG_NAME = os.getenv("ORG_NAME", "stormyy00")
-REPO_NAME = os.getenv("REPO_NAME", "email-automation")
+def _timed(timings, name, func, *args, **kwargs):
+    start = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        timings[name] = round(time.perf_counter() - start, 3)
+
+def _resolved(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+# Merge gates from one GraphQL query (or a state the sweeper already fetched):
+# statusCheckRollup covers commit statuses, check runs and workflow runs, so
+# the separate lookups are resolved as empty
+def _rollup_gates(state):
+    return {
+        "approvals": _resolved(state["approvals"]),
+        "combined_status": _resolved(state["combined_status"]),
+        "workflow_runs": _resolved([]),
+        "check_runs": _resolved([]),
+    }
+
+def _fetch_gates(gh_repo, pr, timings, state=None):
+    if state is None:
+        try:
+            state = _timed(timings, "merge_state", merge_state, gh_repo.full_name, pr.number)
+        except Exception as e:
+            logging.warning(f"⚠️ GraphQL merge state of PR #{pr.number} failed, falling back to REST: {e}")
+            return _fetch_rest_gates(gh_repo, pr, timings)
+    if state["head_sha"] != pr.head.sha:
+        # Pushed to since the state was read; don't judge the new head by the old checks
+        return _fetch_rest_gates(gh_repo, pr, timings)
+    return _rollup_gates(state)
+
+# Start every GitHub lookup the merge gates need at once; the status and
+# check-run lookups only wait on the commit fetch, not on each other. Approvals
+# and the combined status come from the webhook-fed PR store when it's fresh.
+def _fetch_rest_gates(gh_repo, pr, timings):
+    sha = pr.head.sha
+    repo_name = gh_repo.full_name
+    pr_store.track(repo_name, pr)
+
+    def approvals():
+        count = pr_store.approvals(repo_name, pr.number)
+        if count is None:
+            pr_store.set_reviews(repo_name, pr.number, list(pr.get_reviews()))
+            count = pr_store.approvals(repo_name, pr.number)
+        return count
+
+    def combined_status():
+        state = pr_store.combined_status(repo_name, pr.number, sha)
+        if state is not None:
+            return state
+        commit = commit_future.result()
+        status = _timed(timings, "combined_status", commit.get_combined_status)
+        pr_store.set_statuses(repo_name, pr.number, sha, status.statuses)
+        return status.state
 
-# Function to auto-merge PR if it passes certain criteria
-def auto_merge_pr(pr_number, review_content):
+    def check_runs():
+        commit = commit_future.result()
+        return _timed(timings, "check_runs", lambda: list(commit.get_check_runs()))
+
+    with ThreadPoolExecutor(max_workers=MERGE_GATE_WORKERS) as pool:
+        commit_future = pool.submit(_timed, timings, "get_commit", gh_repo.get_commit, sha)
+        return {
+            "approvals": pool.submit(_timed, timings, "reviews", approvals),
+            "workflow_runs": pool.submit(_timed, timings, "workflow_runs", lambda: list(gh_repo.get_workflow_runs(head_sha=sha))),
+            "combined_status": pool.submit(combined_status),
+            "check_runs": pool.submit(check_runs),
+        }
+
+# Function to auto-merge PR if it passes certain criteria; every decision is kept in the review history.
+# `state` is the PR's entry from graphql.list_merge_states when the caller already has it.
+# `retry` is True when the merge failed on an error (e.g. GitHub trouble, a base branch
+# that moved or mergeability not computed yet) rather than on one of the gates, so
+# trying the same head again may work.
+def auto_merge_pr(pr_number, review_content, pr=None, repo_name=None, state=None):
+    repo_name = repo_name or DEFAULT_REPO
+    success, message, timings, retry = _merge_pr(pr_number, review_content, pr, repo_name, state)
+    try:
+        review_history.record_merge(repo_name, pr_number, pr.head.sha if pr else None, success, message, timings.get("total"))
+    except Exception as history_err:
+        logging.warning(f"⚠️ Could not record merge decision for PR #{pr_number}: {history_err}")
+    return success, message, timings, retry
+
+def _merge_pr(pr_number, review_content, pr, repo_name, state=None):
+    timings = {}
+    started = time.perf_counter()
     try:
-        pr = repo.get_pull(pr_number)
+        gh_repo = repo(repo_name)
+        if pr is None:
+            pr = _timed(timings, "get_pull", gh_repo.get_pull, pr_number)
+        
+        # REST reports null while GitHub is still computing mergeability: not a conflict, so worth retrying
+        if pr.mergeable is None:
+            message = f"GitHub is still checking PR #{pr_number} for merge conflicts; try again shortly."
+            logging.warning(f"⚠️ {message}")
+            return False, message, timings, True
         
         # Check if PR is mergeable
         if not pr.mergeable:
@@ -23,11 +119,13 @@ def auto_merge_pr(pr_number, review_content):
                 color=0xFFAA00  # Amber
             )
             
-            return False, message
+            return False, message, timings, False
+        
+        gates = _fetch_gates(gh_repo, pr, timings, state)
+        timings["gates"] = round(time.perf_counter() - started, 3)
         
         # Check for required approvals
-        reviews = pr.get_reviews()
-        approval_count = sum(1 for review in reviews if review.state == "APPROVED")
+        approval_count = gates["approvals"].result()
         
         if approval_count < 1:  # Require at least one human approval
             message = f"PR #{pr_number} doesn't have required human approvals."
@@ -40,15 +138,14 @@ def auto_merge_pr(pr_number, review_content):
                 color=0xFFAA00  # Amber
             )
             
-            return False, message
+            return False, message, timings, False
         
         # Check if all required checks/workflows have passed
-        commit = repo.get_commit(pr.head.sha)
-        combined_status = commit.get_combined_status()
+        combined_state = gates["combined_status"].result()
         
         # Check commit status
-        if combined_status.state != "success":
-            message = f"PR #{pr_number} has failing status checks ({combined_status.state})."
+        if combined_state != "success":
+            message = f"PR #{pr_number} has failing status checks ({combined_state})."
             logging.warning(f"⚠️ {message}")
             
             # Send Discord notification
@@ -58,11 +155,11 @@ def auto_merge_pr(pr_number, review_content):
                 color=0xFFAA00  # Amber
             )
             
-            return False, message
+            return False, message, timings, False
         
         # Check GitHub Actions workflow runs
         try:
-            workflow_runs = list(repo.get_workflow_runs(head_sha=pr.head.sha))
+            workflow_runs = gates["workflow_runs"].result()
             failing_workflows = [run for run in workflow_runs if run.conclusion not in ["success", "skipped"]]
             
             if failing_workflows:
@@ -77,7 +174,7 @@ def auto_merge_pr(pr_number, review_content):
                     color=0xFFAA00  # Amber
                 )
                 
-                return False, message
+                return False, message, timings, False
                 
         except Exception as workflow_err:
             logging.warning(f"⚠️ Could not check workflow runs: {workflow_err}")
@@ -85,7 +182,7 @@ def auto_merge_pr(pr_number, review_content):
         
         # Check specific check runs (like CI tests)
         try:
-            check_runs = list(commit.get_check_runs())
+            check_runs = gates["check_runs"].result()
             failing_checks = [check for check in check_runs if check.conclusion not in ["success", "skipped", "neutral"]]
             
             if failing_checks:
@@ -100,14 +197,15 @@ def auto_merge_pr(pr_number, review_content):
                     color=0xFFAA00  # Amber
                 )
                 
-                return False, message
+                return False, message, timings, False
                 
         except Exception as check_err:
             logging.warning(f"⚠️ Could not check run status: {check_err}")
             # Continue anyway since this might fail in some cases, but log it
         
-        # If the AI review contains negative feedback, don't auto-merge
-        if any(term in review_content.lower() for term in ["error", "issue", "unsafe", "not recommended", "don't merge"]):
+        # If the AI review says NEEDS REVIEW or contains negative feedback, don't auto-merge;
+        # the review history files the review under the same verdict
+        if review_verdict(review_content) == "needs_review":
             message = f"AI review flagged potential issues in PR #{pr_number}."
             logging.warning(f"⚠️ {message}")
             
@@ -121,10 +219,10 @@ def auto_merge_pr(pr_number, review_content):
                 ]
             )
             
-            return False, message
+            return False, message, timings, False
         
         # Execute merge
-        merge_result = pr.merge(
+        merge_result = _timed(timings, "merge", pr.merge,
             commit_title=f"Auto-merge PR #{pr_number}: {pr.title}",
             commit_message=f"Automatically merged via PR automation tool.\n\nAI Review:\n{review_content}",
             merge_method="squash"
@@ -140,13 +238,13 @@ def auto_merge_pr(pr_number, review_content):
                 description=f"PR was automatically merged based on AI review",
                 color=0x00FF00,  # Green
                 fields=[
-                    {"name": "Repository", "value": f"{ORG_NAME}/{REPO_NAME}", "inline": True},
+                    {"name": "Repository", "value": repo_name, "inline": True},
                     {"name": "Author", "value": pr.user.login, "inline": True},
                     {"name": "AI Review", "value": review_content[:2000] + ("..." if len(review_content) > 2000 else "")}
                 ]
             )
             
-            return True, message
+            return True, message, timings, False
         else:
             message = f"Failed to auto-merge PR #{pr_number}: {merge_result.message}"
             logging.warning(f"⚠️ {message}")
@@ -158,7 +256,7 @@ def auto_merge_pr(pr_number, review_content):
                 color=0xFF0000  # Red
             )
             
-            return False, message
+            return False, message, timings, True
             
     except Exception as e:
         message = f"Error during auto-merge of PR #{pr_number}: {e}"
@@ -171,4 +269,6 @@ def auto_merge_pr(pr_number, review_content):
             color=0xFF0000  # Red
         )
         
-        return False, message
\ No newline at end of file
+        return False, message, timings, True
+    finally:
+        timings["total"] = round(time.perf_counter() - started, 3)
@@ -0,0 +1,106 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import repo, GITHUB_POOL_SIZE, BULK_REVIEW_PARALLELISM, BULK_REVIEW_PREFETCH
+from .analyze import analyze_pr, find_cached_review
+from .llm import model_resolver, INTERACTIVE
+
+
+# Review many PRs of one repository as a two-stage pipeline: PRs are fetched
+# concurrently and each one goes on to the review stage as soon as it arrives,
+# with at most `parallelism` reviews and `prefetch` fetched-but-unreviewed PRs at
+# a time. The review stage reads each diff itself, only as far as the prompt
+# budget goes, so no full diff is held while a PR waits. The repository and model are looked up once, up front, so setup
+# errors raise here instead of in the middle of the stream. The returned generator
+# yields one result per PR in the order they finish, then a summary.
+def bulk_review(repo_name, pr_numbers, force=False, priority=INTERACTIVE,
+                parallelism=BULK_REVIEW_PARALLELISM, prefetch=BULK_REVIEW_PREFETCH):
+    gh_repo = repo(repo_name)
+    model = model_resolver.resolve()
+    return _run(gh_repo, repo_name, list(pr_numbers), model, force, priority, max(1, parallelism), max(1, prefetch))
+
+
+def _run(gh_repo, repo_name, pr_numbers, model, force, priority, parallelism, prefetch):
+    results = queue.Queue()
+    slots = threading.BoundedSemaphore(prefetch)
+    cancelled = threading.Event()
+    fetch_pool = ThreadPoolExecutor(max_workers=max(1, min(GITHUB_POOL_SIZE, prefetch, len(pr_numbers))), thread_name_prefix="bulk-fetch")
+    review_pool = ThreadPoolExecutor(max_workers=parallelism, thread_name_prefix="bulk-review")
+
+    def done(pr_number, pr, review, started, cached):
+        return {
+            "repo": repo_name,
+            "pr_number": pr_number,
+            "title": pr.title,
+            "review": review,
+            "cached": cached,
+            "duration": round(time.perf_counter() - started, 3),
+        }
+
+    def failed(pr_number, error):
+        return {"repo": repo_name, "pr_number": pr_number, "error": str(error)}
+
+    def fetch(pr_number):
+        # Wait for room in the review stage, so a slow model doesn't pile up fetched PRs
+        while not slots.acquire(timeout=1):
+            if cancelled.is_set():
+                return
+        if cancelled.is_set():
+            slots.release()
+            return
+        started = time.perf_counter()
+        try:
+            pr = gh_repo.get_pull(pr_number)
+            cached_review = None if force else find_cached_review(repo_name, pr_number, pr, model)
+            if cached_review is not None:
+                slots.release()
+                results.put(done(pr_number, pr, cached_review, started, cached=True))
+                return
+            review_pool.submit(review, pr_number, pr, started)
+        except Exception as e:
+            slots.release()
+            logging.error(f"❌ Error fetching PR #{pr_number} of {repo_name} for a bulk review: {e}")
+            results.put(failed(pr_number, e))
+
+    def review(pr_number, pr, started):
+        try:
+            if cancelled.is_set():
+                return
+            review_content = analyze_pr(pr_number, force=force, pr=pr, repo_name=repo_name, priority=priority)
+            results.put(done(pr_number, pr, review_content, started, cached=False))
+        except Exception as e:
+            logging.error(f"❌ Error reviewing PR #{pr_number} of {repo_name} in a bulk review: {e}")
+            results.put(failed(pr_number, e))
+        finally:
+            slots.release()
+
+    def stream():
+        started = time.perf_counter()
+        summary = {"done": True, "repo": repo_name, "prs": len(pr_numbers), "reviewed": 0, "cached": 0, "errors": 0}
+        logging.info(f"Bulk review of {len(pr_numbers)} PR(s) of {repo_name} with parallelism {parallelism}")
+        try:
+            for pr_number in pr_numbers:
+                fetch_pool.submit(fetch, pr_number)
+            for _ in pr_numbers:
+                result = results.get()
+                if "error" in result:
+                    summary["errors"] += 1
+                elif result["cached"]:
+                    summary["cached"] += 1
+                else:
+                    summary["reviewed"] += 1
+                yield result
+            summary["duration"] = round(time.perf_counter() - started, 3)
+            logging.info(f"✅ Bulk review of {repo_name} finished in {summary['duration']}s: {summary['reviewed']} reviewed, "
+                         f"{summary['cached']} cached, {summary['errors']} failed")
+            yield summary
+        finally:
+            # Also reached when the client disconnects: queued work is dropped, running reviews finish and get cached
+            cancelled.set()
+            fetch_pool.shutdown(wait=False, cancel_futures=True)
+            review_pool.shutdown(wait=False, cancel_futures=True)
+
+    return stream()
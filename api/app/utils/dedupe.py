@@ -0,0 +1,185 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+from app.config import WEBHOOK_DELIVERY_TTL, WEBHOOK_DELIVERY_MAX
+
+
+class _Flight:
+    def __init__(self, owner):
+        self.owner = owner
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+        self.waiters = 0
+        # What a streaming leader has produced so far, replayed to callers that join midway
+        self.items = []
+        self.changed = threading.Condition()
+
+    def publish(self, item):
+        with self.changed:
+            self.items.append(item)
+            self.changed.notify_all()
+
+    def finish(self):
+        with self.changed:
+            self.done.set()
+            self.changed.notify_all()
+
+    def follow(self):
+        sent = 0
+        while True:
+            with self.changed:
+                while len(self.items) == sent and not self.done.is_set():
+                    self.changed.wait()
+                items = self.items[sent:]
+                finished = self.done.is_set()
+            sent += len(items)
+            yield from items
+            if finished:
+                return
+
+
+# Coalesces concurrent calls with the same key: the first caller runs the
+# function, later callers wait for it and get the same result (or exception)
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self._flights = {}
+        self._lock = threading.Lock()
+        self._runs = 0
+        self._shared = 0
+
+    def do(self, key, func, *args, **kwargs):
+        role, flight = self._join(key)
+        if role == "reenter":
+            return func(*args, **kwargs)
+        if role == "lead":
+            return self._lead(key, flight, func, args, kwargs)
+
+        logging.info(f"Joining in-flight {self.name} for {key}")
+        flight.done.wait()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    # Streaming counterpart of do for a generator function: its items reach the
+    # caller as they are produced and its return value is the flight's result, so
+    # do() callers of the same key share the run too. A caller joining a streaming
+    # flight gets the items produced so far and then the rest; one joining a do()
+    # flight gets no items. Either way the generator returns the result.
+    def stream(self, key, func, *args, **kwargs):
+        role, flight = self._join(key)
+        if role == "reenter":
+            return (yield from func(*args, **kwargs))
+        if role == "lead":
+            return (yield from self._lead_stream(key, flight, func(*args, **kwargs)))
+
+        logging.info(f"Joining in-flight {self.name} for {key}")
+        yield from flight.follow()
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    def stats(self):
+        with self._lock:
+            return {"in_flight": len(self._flights), "runs": self._runs, "shared": self._shared}
+
+    def _join(self, key):
+        me = threading.get_ident()
+        with self._lock:
+            flight = self._flights.get(key)
+            if flight is None:
+                flight = self._flights[key] = _Flight(me)
+                self._runs += 1
+                return "lead", flight
+            if flight.owner == me:
+                # The leader calling back into its own key runs it directly instead of waiting on itself
+                return "reenter", flight
+            flight.waiters += 1
+            self._shared += 1
+            return "wait", flight
+
+    def _lead(self, key, flight, func, args, kwargs):
+        try:
+            flight.result = func(*args, **kwargs)
+            return flight.result
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+
+    def _lead_stream(self, key, flight, gen):
+        try:
+            while True:
+                try:
+                    item = next(gen)
+                except StopIteration as stop:
+                    flight.result = stop.value
+                    return stop.value
+                flight.publish(item)
+                try:
+                    yield item
+                except GeneratorExit:
+                    # The caller went away: stop the run unless someone joined it, then finish it for them
+                    with self._lock:
+                        abandon = not flight.waiters
+                        if abandon:
+                            del self._flights[key]
+                    if abandon:
+                        gen.close()
+                        raise
+                    while True:
+                        try:
+                            flight.publish(next(gen))
+                        except StopIteration as stop:
+                            flight.result = stop.value
+                            return
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            self._land(key, flight)
+
+    def _land(self, key, flight):
+        with self._lock:
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        flight.finish()
+
+
+# Remembers recent X-GitHub-Delivery IDs so redelivered webhooks are dropped
+class DeliveryLog:
+    def __init__(self, ttl, max_entries):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._seen = OrderedDict()
+        self._lock = threading.Lock()
+        self._duplicates = 0
+
+    def seen(self, delivery_id):
+        # Records the ID and reports whether it was already there
+        now = time.time()
+        with self._lock:
+            while self._seen and (len(self._seen) >= self.max_entries or now - next(iter(self._seen.values())) > self.ttl):
+                self._seen.popitem(last=False)
+            if delivery_id in self._seen:
+                self._duplicates += 1
+                return True
+            self._seen[delivery_id] = now
+            return False
+
+    def forget(self, delivery_id):
+        # Let GitHub's redelivery through when the first attempt wasn't accepted
+        with self._lock:
+            self._seen.pop(delivery_id, None)
+
+    def stats(self):
+        with self._lock:
+            return {"tracked": len(self._seen), "duplicates": self._duplicates}
+
+
+review_flights = SingleFlight("review")
+webhook_deliveries = DeliveryLog(WEBHOOK_DELIVERY_TTL, WEBHOOK_DELIVERY_MAX)
@@ -0,0 +1,200 @@
+import posixpath
+
+# Rough token estimate; close enough for llama-style tokenizers on code
+CHARS_PER_TOKEN = 4
+
+LOCKFILES = {
+    "package-lock.json", "yarn.lock", "pnpm-lock.yaml", "bun.lockb", "poetry.lock", "Pipfile.lock",
+    "uv.lock", "Cargo.lock", "Gemfile.lock", "composer.lock", "go.sum", "mix.lock", "pubspec.lock",
+}
+GENERATED_DIRS = ("vendor/", "vendors/", "third_party/", "node_modules/", "dist/", "build/", "__snapshots__/")
+GENERATED_SUFFIXES = (".min.js", ".min.css", ".map", ".snap", ".pb.go", "_pb2.py", ".lock", ".svg")
+SOURCE_EXTENSIONS = {
+    ".py", ".js", ".jsx", ".ts", ".tsx", ".mjs", ".cjs", ".go", ".rs", ".java", ".kt", ".rb", ".php",
+    ".c", ".h", ".cc", ".cpp", ".hpp", ".cs", ".swift", ".scala", ".sh", ".sql", ".vue", ".svelte",
+}
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+# 0 = source, 1 = docs/config/other, 2 = lockfiles, generated and vendored files
+def file_priority(filename):
+    name = posixpath.basename(filename)
+    path = f"/{filename}"
+    if (
+        name in LOCKFILES
+        or ".generated." in name
+        or name.endswith(GENERATED_SUFFIXES)
+        or any(f"/{d}" in path for d in GENERATED_DIRS)
+    ):
+        return 2
+    if posixpath.splitext(name)[1].lower() in SOURCE_EXTENSIONS:
+        return 0
+    return 1
+
+
+def file_tokens(file):
+    patch = file.patch if getattr(file, "patch", None) else "Binary file or no patch available"
+    return estimate_tokens(f"File: {file.filename}\nChanges: {patch}\n\n")
+
+
+# Size of a PR's diff from its line counts, before any of it is fetched; changed
+# lines come with context lines and hunk headers, hence the factor of 1.5
+AVG_LINE_CHARS = 40
+
+
+def estimate_pr_tokens(pr):
+    return int((pr.additions + pr.deletions) * AVG_LINE_CHARS * 1.5) // CHARS_PER_TOKEN
+
+
+# Split a patch into its @@ hunks
+def split_hunks(patch):
+    hunks = []
+    for line in patch.split("\n"):
+        if line.startswith("@@") or not hunks:
+            hunks.append([])
+        hunks[-1].append(line)
+    return ["\n".join(hunk) for hunk in hunks]
+
+
+def _patch_size(file):
+    return len(file.patch) if getattr(file, "patch", None) else 0
+
+
+# Pack file patches into a token budget, most relevant files first (smaller
+# ones first within a tier, so one huge file can't crowd out the rest). Files
+# that don't fit whole are cut at hunk boundaries; files with no room are omitted.
+def pack_diff(files, budget_tokens):
+    ranked = sorted(files, key=lambda f: (file_priority(f.filename), _patch_size(f)))
+
+    parts = []
+    used = 0
+    included, truncated, omitted = [], [], []
+
+    for file in ranked:
+        patch = file.patch if getattr(file, "patch", None) else None
+        header = f"File: {file.filename}\nChanges: "
+        remaining = budget_tokens - used
+
+        if patch is None:
+            entry = header + "Binary file or no patch available\n\n"
+            if estimate_tokens(entry) > remaining:
+                omitted.append(file.filename)
+                continue
+            parts.append(entry)
+            used += estimate_tokens(entry)
+            included.append(file.filename)
+            continue
+
+        allowance = remaining - estimate_tokens(header) - 8
+        if estimate_tokens(patch) <= allowance:
+            parts.append(f"{header}{patch}\n\n")
+            used += estimate_tokens(parts[-1])
+            included.append(file.filename)
+            continue
+
+        kept = []
+        kept_tokens = 0
+        hunks = split_hunks(patch)
+        for hunk in hunks:
+            hunk_tokens = estimate_tokens(hunk) + 1
+            if kept_tokens + hunk_tokens > allowance:
+                break
+            kept.append(hunk)
+            kept_tokens += hunk_tokens
+
+        if not kept:
+            omitted.append(file.filename)
+            continue
+        parts.append(f"{header}" + "\n".join(kept) + f"\n... [{len(hunks) - len(kept)} more hunk(s) truncated]\n\n")
+        used += estimate_tokens(parts[-1])
+        truncated.append(file.filename)
+
+    return {
+        "content": "".join(parts),
+        "tokens": used,
+        "included": included,
+        "truncated": truncated,
+        "omitted": omitted,
+        "complete": True,
+    }
+
+
+# Single-pass variant of pack_diff for a lazily parsed diff stream. Source files
+# are packed as they arrive; docs, config, lockfiles and generated files are held
+# back (at most a budget's worth of their hunks) and packed after every source
+# file in the stream, in the same order pack_diff uses. Reading stops once source
+# files have spent the budget, so the rest of the diff is never downloaded.
+def pack_diff_stream(files, budget_tokens):
+    parts = []
+    used = 0
+    included, truncated, omitted = [], [], []
+    complete = True
+    held, held_tokens = [], 0
+
+    def add(filename, kept, cut):
+        nonlocal used
+        header = f"File: {filename}\nChanges: "
+        if not kept and not cut:
+            entry = header + "Binary file or no patch available\n\n"
+            if estimate_tokens(entry) > budget_tokens - used:
+                omitted.append(filename)
+                return
+            parts.append(entry)
+            included.append(filename)
+        elif not kept:
+            omitted.append(filename)
+            return
+        elif cut:
+            parts.append(f"{header}" + "\n".join(kept) + "\n... [remaining hunks truncated]\n\n")
+            truncated.append(filename)
+        else:
+            parts.append(f"{header}" + "\n".join(kept) + "\n\n")
+            included.append(filename)
+        used += estimate_tokens(parts[-1])
+
+    def take(hunks, allowance):
+        # Whole hunks up to the allowance, and whether any were left over
+        kept, kept_tokens = [], 0
+        for hunk in hunks:
+            hunk_tokens = estimate_tokens(hunk) + 1
+            if kept_tokens + hunk_tokens > allowance:
+                return kept, kept_tokens, True
+            kept.append(hunk)
+            kept_tokens += hunk_tokens
+        return kept, kept_tokens, False
+
+    for file in files:
+        if budget_tokens - used < 16:
+            complete = False
+            break
+        priority = file_priority(file.filename)
+        hunks = [] if file.binary else file.hunks()
+        if priority == 0:
+            allowance = budget_tokens - used - estimate_tokens(f"File: {file.filename}\nChanges: ") - 8
+            kept, _, cut = take(hunks, allowance)
+            add(file.filename, kept, cut)
+        else:
+            kept, kept_tokens, cut = take(hunks, budget_tokens - held_tokens)
+            held_tokens += kept_tokens
+            held.append((priority, kept_tokens, file.filename, kept, cut))
+
+    close = getattr(files, "close", None)
+    if close:
+        close()
+
+    for _, _, filename, hunks, cut in sorted(held, key=lambda h: (h[0], h[1])):
+        allowance = budget_tokens - used - estimate_tokens(f"File: {filename}\nChanges: ") - 8
+        kept, _, left_over = take(hunks, allowance)
+        add(filename, kept, cut or left_over)
+
+    return {
+        "content": "".join(parts),
+        "tokens": used,
+        "included": included,
+        "truncated": truncated,
+        "omitted": omitted,
+        "complete": complete,
+    }
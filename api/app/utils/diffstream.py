@@ -0,0 +1,173 @@
+import logging
+
+from app.config import github_clients
+from .diffpack import split_hunks
+
+DIFF_MEDIA_TYPE = "application/vnd.github.diff"
+
+
+# One file of a unified diff. Hunks are parsed from the response as they are
+# iterated; whatever the consumer leaves unread is skipped, not kept.
+class DiffFile:
+    def __init__(self, filename, status, binary, lines):
+        self.filename = filename
+        self.status = status
+        self.binary = binary
+        self.additions = 0
+        self.deletions = 0
+        self._lines = lines
+        self._patch = None
+        self._done = binary
+
+    @property
+    def patch(self):
+        # Same shape as the files API: hunks only, no file headers; None for binaries
+        if self._patch is None and not self.binary:
+            self._patch = "\n".join(self.hunks())
+        return self._patch
+
+    def load(self):
+        # Read the remaining hunks now, before the stream moves on to the next file
+        self.patch
+        return self
+
+    @property
+    def changes(self):
+        return self.additions + self.deletions
+
+    def hunks(self):
+        if self._patch is not None:
+            yield from split_hunks(self._patch)
+            return
+        hunk = []
+        while not self._done:
+            line = self._lines.peek()
+            if line is None or line.startswith("diff --git "):
+                self._done = True
+                break
+            self._lines.next()
+            if line.startswith("@@") and hunk:
+                yield "\n".join(hunk)
+                hunk = []
+            if line.startswith("+"):
+                self.additions += 1
+            elif line.startswith("-"):
+                self.deletions += 1
+            hunk.append(line)
+        if hunk:
+            yield "\n".join(hunk)
+
+    def skip(self):
+        while not self._done:
+            line = self._lines.peek()
+            if line is None or line.startswith("diff --git "):
+                self._done = True
+                break
+            self._lines.next()
+
+
+class _Lines:
+    def __init__(self, lines):
+        self._lines = iter(lines)
+        self._next = None
+        self._peeked = False
+
+    def peek(self):
+        if not self._peeked:
+            self._next = next(self._lines, None)
+            self._peeked = True
+        return self._next
+
+    def next(self):
+        line = self.peek()
+        self._peeked = False
+        return line
+
+
+def _git_path(header):
+    # "diff --git a/x b/x": both sides are equal unless renamed, so split in the middle
+    rest = header[len("diff --git a/"):]
+    half = (len(rest) - len(" b/")) // 2
+    if rest[half:half + 3] == " b/" and rest[:half] == rest[half + 3:]:
+        return rest[:half]
+    return rest.rsplit(" b/", 1)[-1]
+
+
+def _iter_lines(response, chunk_size=64 * 1024):
+    # Split on "\n" only; iter_lines() would also break on \r and form feeds inside lines
+    response.encoding = response.encoding or "utf-8"
+    pending = ""
+    for chunk in response.iter_content(chunk_size=chunk_size, decode_unicode=True):
+        pending += chunk
+        *lines, pending = pending.split("\n")
+        yield from lines
+    if pending:
+        yield pending
+
+
+def parse_diff(lines):
+    # Yields a DiffFile per "diff --git" block of a unified diff
+    lines = _Lines(lines)
+    while True:
+        line = lines.next()
+        while line is not None and not line.startswith("diff --git "):
+            line = lines.next()
+        if line is None:
+            return
+
+        filename, status, binary = _git_path(line), "modified", False
+        while True:
+            line = lines.peek()
+            if line is None or line.startswith(("diff --git ", "@@")):
+                break
+            lines.next()
+            if line.startswith("new file mode"):
+                status = "added"
+            elif line.startswith("deleted file mode"):
+                status = "removed"
+            elif line.startswith("rename to "):
+                status, filename = "renamed", line[len("rename to "):]
+            elif line.startswith("+++ b/"):
+                filename = line[len("+++ b/"):]
+            elif line.startswith("Binary files "):
+                binary = True
+
+        file = DiffFile(filename, status, binary, lines)
+        yield file
+        file.skip()
+
+
+# Open the PR's unified diff as one streamed request. Raises if GitHub won't
+# serve it (e.g. 406 for diffs over its size limit) so callers can fall back
+# to the files API; the body is only read as the returned generator advances.
+def open_pr_diff(full_name, pr_number):
+    response = github_clients.stream(f"/repos/{full_name}/pulls/{pr_number}", DIFF_MEDIA_TYPE)
+    if response.status_code != 200:
+        response.close()
+        raise RuntimeError(f"GitHub returned {response.status_code} for the diff of {full_name}#{pr_number}")
+
+    def files():
+        try:
+            yield from parse_diff(_iter_lines(response))
+        finally:
+            # Stops the download when the consumer has what it needs
+            response.close()
+
+    return files()
+
+
+# PR files for the prompt builder: a lazily parsed diff stream, or the files API when that fails
+def pr_files(full_name, pr):
+    try:
+        return open_pr_diff(full_name, pr.number)
+    except Exception as e:
+        logging.warning(f"⚠️ Could not stream the diff of {full_name}#{pr.number}, using the files API: {e}")
+        return list(pr.get_files())
+
+
+# The whole diff in memory, for map-reduce reviews that need every file
+def load_pr_files(full_name, pr):
+    files = pr_files(full_name, pr)
+    if isinstance(files, list):
+        return files
+    return [file.load() for file in files]
@@ -1,45 +1,145 @@
 import logging
-import os 
+import queue
+import threading
+import time
 import requests
-import json
 
-DISCORD_WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL")
+from app.config import DISCORD_WEBHOOK_URL, DISCORD_QUEUE_SIZE, DISCORD_TIMEOUT, DISCORD_BATCH_WINDOW
+from .metrics import discord_post_duration
+
+# Discord allows 10 embeds per message and 6000 characters across all of them
+MAX_EMBEDS_PER_MESSAGE = 10
+MAX_EMBED_CHARS_PER_MESSAGE = 6000
+MAX_RETRIES = 5
+
+
+def _embed_size(embed):
+    size = len(embed.get("title") or "") + len(embed.get("description") or "")
+    for field in embed.get("fields") or []:
+        size += len(field.get("name") or "") + len(field.get("value") or "")
+    return size
+
+
+# Posts embeds from a bounded queue on a background thread, packing several
+# notifications into one webhook message and backing off on 429s
+class DiscordNotifier:
+    def __init__(self, url, maxsize, timeout, batch_window):
+        self.url = url
+        self.timeout = timeout
+        self.batch_window = batch_window
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._session = requests.Session()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._carry = None
+        self._counts = {"queued": 0, "sent": 0, "dropped": 0, "failed": 0, "messages": 0, "rate_limited": 0}
+
+    def notify(self, embed):
+        self._start()
+        try:
+            self._queue.put_nowait(embed)
+        except queue.Full:
+            with self._lock:
+                self._counts["dropped"] += 1
+            logging.warning(f"⚠️ Discord queue full, dropping notification: {embed.get('title')}")
+            return False
+        with self._lock:
+            self._counts["queued"] += 1
+        return True
+
+    def stats(self):
+        with self._lock:
+            return {"depth": self._queue.qsize(), "capacity": self._queue.maxsize, **self._counts}
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._work, name="discord-notifier", daemon=True)
+                self._thread.start()
+
+    def _next_batch(self):
+        batch = [self._carry] if self._carry else [self._queue.get()]
+        self._carry = None
+        size = _embed_size(batch[0])
+        deadline = time.monotonic() + self.batch_window
+
+        # Give notifications fired together a moment to arrive so they share a message
+        while len(batch) < MAX_EMBEDS_PER_MESSAGE:
+            try:
+                embed = self._queue.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                break
+            if size + _embed_size(embed) > MAX_EMBED_CHARS_PER_MESSAGE:
+                self._carry = embed
+                break
+            batch.append(embed)
+            size += _embed_size(embed)
+        return batch
+
+    def _work(self):
+        while True:
+            batch = self._next_batch()
+            try:
+                sent = self._post(batch)
+            except Exception as e:
+                logging.error(f"❌ Error sending Discord notification: {e}")
+                sent = False
+            with self._lock:
+                self._counts["sent" if sent else "failed"] += len(batch)
+                self._counts["messages"] += int(sent)
+
+    def _post(self, embeds):
+        for _ in range(MAX_RETRIES):
+            with discord_post_duration.time(status="error") as labels:
+                response = self._session.post(self.url, json={"embeds": embeds}, timeout=self.timeout)
+                labels["status"] = response.status_code
+
+            if response.status_code == 429:
+                with self._lock:
+                    self._counts["rate_limited"] += 1
+                try:
+                    retry_after = float(response.json().get("retry_after", 1))
+                except ValueError:
+                    retry_after = float(response.headers.get("Retry-After", 1))
+                logging.warning(f"⚠️ Discord rate limited, retrying in {retry_after:.2f}s")
+                time.sleep(retry_after)
+                continue
+
+            if response.status_code in (200, 204):
+                logging.info(f"✅ Discord notification sent: {', '.join(e['title'] for e in embeds)}")
+                # Wait out the bucket instead of walking into a 429 on the next message
+                if response.headers.get("X-RateLimit-Remaining") == "0":
+                    time.sleep(float(response.headers.get("X-RateLimit-Reset-After", 0)))
+                return True
+
+            logging.error(f"❌ Discord notification failed: {response.status_code} - {response.text}")
+            return False
+
+        logging.error(f"❌ Discord notification failed after {MAX_RETRIES} rate-limited attempts")
+        return False
+
+
+discord_notifier = DiscordNotifier(DISCORD_WEBHOOK_URL, DISCORD_QUEUE_SIZE, DISCORD_TIMEOUT, DISCORD_BATCH_WINDOW)
+
 
 def send_discord_notification(title, description, color=0x5865F2, fields=None):
     if not DISCORD_WEBHOOK_URL:
         logging.warning("Discord notification skipped: No webhook URL configured")
         return False
-    
-    try:
-        # Create Discord embed
-        embed = {
-            "title": title,
-            "description": description,
-            "color": color,
-            "timestamp": None  # Discord will use current time
-        }
-        
-        # Add fields if provided
-        if fields:
-            embed["fields"] = fields
-        
-        payload = {
-            "embeds": [embed]
-        }
-        
-        response = requests.post(
-            DISCORD_WEBHOOK_URL,
-            data=json.dumps(payload),
-            headers={"Content-Type": "application/json"}
-        )
-        
-        if response.status_code == 204:
-            logging.info(f"✅ Discord notification sent: {title}")
-            return True
-        else:
-            logging.error(f"❌ Discord notification failed: {response.status_code} - {response.text}")
-            return False
-    
-    except Exception as e:
-        logging.error(f"❌ Error sending Discord notification: {e}")
-        return False
\ No newline at end of file
+
+    # Create Discord embed
+    embed = {
+        "title": title,
+        "description": description,
+        "color": color,
+        "timestamp": None  # Discord will use current time
+    }
+
+    # Add fields if provided
+    if fields:
+        embed["fields"] = fields
+
+    # Queued; delivered by the background notifier
+    return discord_notifier.notify(embed)
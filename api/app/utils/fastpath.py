@@ -0,0 +1,184 @@
+import posixpath
+import re
+import threading
+from collections import Counter
+
+from app.config import FAST_PATH_VERSION_LINES, FAST_PATH_MANIFEST_LINES
+from .diffpack import LOCKFILES
+from .metrics import registry
+from .review_cache import prompt_hash
+
+DOC_EXTENSIONS = {".md", ".markdown", ".mdx", ".rst", ".adoc", ".asciidoc"}
+# Plain text counts as documentation only inside a docs directory or as e.g. LICENSE.txt;
+# anything else there (conf.py, build scripts) is code
+DOC_DIRS = ("docs/", "doc/")
+DOC_TEXT_EXTENSIONS = {".txt"}
+DOC_NAMES = ("README", "CHANGELOG", "CHANGES", "LICENSE", "NOTICE", "AUTHORS", "CONTRIBUTING", "CODE_OF_CONDUCT", "SECURITY")
+MANIFESTS = {
+    "package.json", "pyproject.toml", "Pipfile", "Cargo.toml", "go.mod", "Gemfile", "composer.json",
+    "pubspec.yaml", "mix.exs", "pom.xml", "build.gradle", "build.gradle.kts",
+}
+REQUIREMENTS_PATTERN = re.compile(r"^requirements([-_.][\w.-]*)?\.(txt|in)$")
+
+# A changed line that only moves a version number, e.g. `version = "1.2.3"` or `"react": "^18.2.0"`
+VERSION_PATTERN = re.compile(r"v?\d+(\.\d+)+")
+VERSION_ASSIGNMENT = re.compile(r"""^\s*["']?_*version_*["']?\s*[:=]\s*["']?v?\d+(\.\d+)+""", re.IGNORECASE)
+# Integrity hashes and checksums that lockfiles update along with the versions
+HASH_PATTERN = re.compile(r"\b(sha1|sha256|sha384|sha512)-[A-Za-z0-9+/]+=*|\b[0-9a-f]{40,}\b")
+
+# Counts, not file names, go into the review: a name like docs/errors.md would
+# trip the merge gate's wording check
+FAST_PATH_TEMPLATE = """Automated review: {summary}
+
+{details}
+
+This PR changes no application code, so it was matched by the trivial-change rules instead of being sent to the model.
+
+Verdict: SAFE TO MERGE"""
+FAST_PATH_PROMPT_HASH = prompt_hash(FAST_PATH_TEMPLATE)
+FAST_PATH_MODEL = "rules"
+
+llm_calls_avoided = registry.counter(
+    "review_llm_calls_avoided_total", "Reviews answered by the trivial-change rules instead of Ollama", ("rule",)
+)
+
+
+# (sign, text) of every added or removed line
+def _changed_lines(file):
+    patch = getattr(file, "patch", None) or ""
+    return [(line[0], line[1:]) for line in patch.split("\n") if line[:1] in ("+", "-") and not line.startswith(("+++", "---"))]
+
+
+def is_doc(filename):
+    stem, extension = posixpath.splitext(posixpath.basename(filename))
+    extension = extension.lower()
+    return (
+        extension in DOC_EXTENSIONS
+        or (stem.upper() in DOC_NAMES and (not extension or extension in DOC_TEXT_EXTENSIONS))
+        or (filename.startswith(DOC_DIRS) and extension in DOC_TEXT_EXTENSIONS)
+    ) and not is_manifest(filename)
+
+
+def is_manifest(filename):
+    name = posixpath.basename(filename)
+    return name in MANIFESTS or bool(REQUIREMENTS_PATTERN.match(name))
+
+
+def is_lockfile(filename):
+    return posixpath.basename(filename) in LOCKFILES
+
+
+def _without_versions(line, hashes):
+    if hashes:
+        line = HASH_PATTERN.sub("<hash>", line)
+    return VERSION_PATTERN.sub("<version>", line).strip()
+
+
+# Every removed line is paired with an added line for the same key that differs only
+# in its version numbers (and, for lockfiles, hashes): nothing is added or removed on
+# its own, so no new dependency, script or URL slips in. Binaries can't be checked.
+def _only_versions(files, hashes=False):
+    for file in files:
+        if getattr(file, "patch", None) is None:
+            return False
+        removed, added = Counter(), Counter()
+        for sign, line in _changed_lines(file):
+            if not line.strip():
+                continue
+            if not VERSION_PATTERN.search(line) and not (hashes and HASH_PATTERN.search(line)):
+                return False
+            (removed if sign == "-" else added)[_without_versions(line, hashes)] += 1
+        if not removed or removed != added:
+            return False
+    return True
+
+
+def _docs(files):
+    if all(is_doc(file.filename) for file in files):
+        return f"documentation-only change to {len(files)} file(s)", "Only documentation files are touched."
+    return None
+
+
+def _dependencies(files):
+    if not all(is_lockfile(file.filename) or is_manifest(file.filename) for file in files):
+        return None
+    manifests = [file for file in files if is_manifest(file.filename)]
+    lockfiles = [file for file in files if not is_manifest(file.filename)]
+    # Lockfile churn without a manifest bump to explain it goes to the model
+    if not manifests or sum(file.additions + file.deletions for file in manifests) > FAST_PATH_MANIFEST_LINES:
+        return None
+    if not _only_versions(manifests) or not _only_versions(lockfiles, hashes=True):
+        return None
+    return (
+        f"dependency update across {len(manifests)} manifest(s) and {len(lockfiles)} lockfile(s)",
+        "Manifest and lockfile edits only change version numbers and checksums of existing dependencies.",
+    )
+
+
+def _version_bump(files):
+    if sum(file.additions + file.deletions for file in files) > FAST_PATH_VERSION_LINES:
+        return None
+    lines = [line for file in files for _, line in _changed_lines(file) if line.strip()]
+    if not lines or not _only_versions(files):
+        return None
+    if not all(VERSION_ASSIGNMENT.match(line) or VERSION_PATTERN.fullmatch(line.strip()) for line in lines):
+        return None
+    return f"version bump in {len(files)} file(s)", "Only version numbers change."
+
+
+RULES = (("docs", _docs), ("version_bump", _version_bump), ("dependencies", _dependencies))
+
+
+# Match changed files (file objects with filename, additions, deletions and
+# patch) against the trivial-change rules; returns (rule, summary, details) or None
+def classify(files):
+    if not files:
+        return None
+    for rule, check in RULES:
+        matched = check(files)
+        if matched:
+            summary, details = matched
+            additions = sum(file.additions for file in files)
+            deletions = sum(file.deletions for file in files)
+            return rule, f"{summary} (+{additions}/-{deletions})", details
+    return None
+
+
+def fast_path_review(match):
+    _, summary, details = match
+    return FAST_PATH_TEMPLATE.format(summary=f"{summary}.", details=details)
+
+
+# Appended to the previous review when only trivial commits were pushed since
+def fast_path_update(match, base_sha):
+    _, summary, details = match
+    return f"Update since {base_sha[:7]}: {summary}. {details} The review above still applies to the rest of the PR."
+
+
+# How many reviews the rules answered and how many went on to the model
+class FastPathStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._checked = 0
+        self._matched = {}
+
+    def record(self, rule):
+        with self._lock:
+            self._checked += 1
+            if rule:
+                self._matched[rule] = self._matched.get(rule, 0) + 1
+        if rule:
+            llm_calls_avoided.inc(rule=rule)
+
+    def stats(self):
+        with self._lock:
+            avoided = sum(self._matched.values())
+            return {
+                "checked": self._checked,
+                "llm_calls_avoided": avoided,
+                "sent_to_model": self._checked - avoided,
+                "by_rule": dict(self._matched),
+            }
+
+
+fast_path_stats = FastPathStats()
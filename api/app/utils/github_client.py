@@ -0,0 +1,283 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+import requests
+from github import Auth, Github
+from github.Requester import HTTPRequestsConnectionClass, HTTPSRequestsConnectionClass, RequestsResponse
+
+from .metrics import github_request_duration, github_endpoint
+
+
+# Remembers ETag/Last-Modified validators and bodies of GitHub GET responses,
+# up to max_entries responses and max_bytes of bodies (least recently used go first).
+# A 304 answer to a conditional request doesn't count against the rate limit.
+class ConditionalCache:
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._uncached = 0
+        # Per X-RateLimit-Resource: REST calls spend "core", GraphQL queries "graphql"
+        self._rate_limits = {}
+
+    def send(self, session, method, url, headers, **kwargs):
+        if method != "GET":
+            response = session.request(method, url, headers=headers, **kwargs)
+            self._track_rate_limit(response)
+            return response
+
+        key = (url, headers.get("Accept"))
+        with self._lock:
+            cached = self._entries.get(key)
+        if cached:
+            headers = dict(headers)
+            if cached.headers.get("ETag"):
+                headers["If-None-Match"] = cached.headers["ETag"]
+            if cached.headers.get("Last-Modified"):
+                headers["If-Modified-Since"] = cached.headers["Last-Modified"]
+
+        response = session.request(method, url, headers=headers, **kwargs)
+        self._track_rate_limit(response)
+
+        if response.status_code == 304 and cached:
+            with self._lock:
+                self._hits += 1
+                self._entries.move_to_end(key)
+            return self._replay(cached, response)
+
+        with self._lock:
+            if response.status_code == 200:
+                # A newer body replaces the stored one, or makes it stale if it can't be revalidated
+                self._drop(key)
+            size = len(response.content) if response.status_code == 200 else 0
+            if (response.status_code == 200 and size <= self.max_bytes
+                    and (response.headers.get("ETag") or response.headers.get("Last-Modified"))):
+                self._misses += 1
+                self._entries[key] = response
+                self._bytes += size
+                while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                    self._drop(next(iter(self._entries)))
+            else:
+                self._uncached += 1
+        return response
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "uncached": self._uncached,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "rate_limit": {resource: dict(limit) for resource, limit in self._rate_limits.items()},
+            }
+
+    def _drop(self, key):
+        # Caller holds the lock
+        cached = self._entries.pop(key, None)
+        if cached is not None:
+            self._bytes -= len(cached.content)
+
+    def _track_rate_limit(self, response, resource="core"):
+        if "X-RateLimit-Remaining" not in response.headers:
+            return
+        resource = response.headers.get("X-RateLimit-Resource", resource)
+        with self._lock:
+            self._rate_limits[resource] = {
+                "remaining": int(response.headers["X-RateLimit-Remaining"]),
+                "limit": int(response.headers.get("X-RateLimit-Limit", 0)),
+                "reset": int(response.headers.get("X-RateLimit-Reset", 0)),
+            }
+
+    @staticmethod
+    def _replay(cached, not_modified):
+        # Serve the stored body with the fresh response's headers (rate limit etc.)
+        response = requests.Response()
+        response.status_code = 200
+        response._content = cached.content
+        response.encoding = cached.encoding
+        response.url = cached.url
+        response.request = not_modified.request
+        response.headers = requests.structures.CaseInsensitiveDict(cached.headers)
+        response.headers.update(not_modified.headers)
+        return response
+
+
+# PyGithub keeps a single connection object per client and stashes the pending
+# request on it between request() and getresponse(), so two threads sharing a
+# client can send each other's requests. Keep the pending request per thread
+# and share only the pooled requests.Session.
+class _ThreadSafeConnection:
+    cache = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._pending = threading.local()
+
+    def request(self, verb, url, input, headers, stream=False):
+        self._pending.args = (verb, url, input, headers)
+
+    def getresponse(self):
+        verb, url, input, headers = self._pending.args
+        send = self.cache.send if self.cache else (lambda session, *args, **kwargs: session.request(*args, **kwargs))
+        with github_request_duration.time(method=verb, endpoint=github_endpoint(url), status="error") as labels:
+            response = send(
+                self.session,
+                verb,
+                f"{self.protocol}://{self.host}:{self.port}{url}",
+                headers=headers,
+                data=input,
+                timeout=self.timeout,
+                verify=self.verify,
+                allow_redirects=False,
+            )
+            labels["status"] = response.status_code
+        return RequestsResponse(response)
+
+
+class PooledHTTPSConnection(_ThreadSafeConnection, HTTPSRequestsConnectionClass):
+    pass
+
+
+class PooledHTTPConnection(_ThreadSafeConnection, HTTPRequestsConnectionClass):
+    pass
+
+
+# Process-wide GitHub client with a TTL cache of Repository handles
+class GitHubClients:
+    def __init__(self, token, base_url, pool_size, repo_ttl, seconds_between_requests=None, etag_cache_size=0,
+                 seconds_between_writes=None, etag_cache_bytes=0):
+        self.token = token
+        self.base_url = base_url
+        self.pool_size = pool_size
+        self.conditional_cache = ConditionalCache(etag_cache_size, etag_cache_bytes) if etag_cache_size and etag_cache_bytes else None
+        self.seconds_between_requests = seconds_between_requests
+        self.seconds_between_writes = seconds_between_writes
+        self.repo_ttl = repo_ttl
+        self._github = None
+        self._repos = {}
+        self._org_repos = {}
+        self._session = None
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    def github(self):
+        if self._github is None:
+            with self._lock:
+                if self._github is None:
+                    self._github = self._connect()
+        return self._github
+
+    def get_repo(self, full_name):
+        now = time.monotonic()
+        with self._lock:
+            cached = self._repos.get(full_name)
+            if cached and now - cached[1] < self.repo_ttl:
+                self._hits += 1
+                return cached[0]
+            self._misses += 1
+
+        repository = self.github().get_repo(full_name)
+        with self._lock:
+            self._repos[full_name] = (repository, now)
+        logging.info(f"✅ Connected to GitHub repo: {full_name}")
+        return repository
+
+    def org_repos(self, org):
+        # Full names of the org's repositories; the listing also warms the repo cache
+        now = time.monotonic()
+        with self._lock:
+            cached = self._org_repos.get(org)
+            if cached and now - cached[1] < self.repo_ttl:
+                return cached[0]
+
+        repositories = [r for r in self.github().get_organization(org).get_repos() if not r.archived]
+        names = [r.full_name for r in repositories]
+        with self._lock:
+            self._org_repos[org] = (names, now)
+            for repository in repositories:
+                self._repos[repository.full_name] = (repository, now)
+        logging.info(f"✅ Found {len(names)} repositories in {org}")
+        return names
+
+    def stream(self, path, accept):
+        # Raw streamed GET for media types PyGithub can't return, e.g. PR diffs
+        with github_request_duration.time(method="GET", endpoint=github_endpoint(path), status="error") as labels:
+            response = self._raw_session().get(f"{self.base_url}{path}", headers={"Accept": accept}, stream=True, timeout=30)
+            labels["status"] = response.status_code
+        return response
+
+    def graphql(self, query, variables):
+        # Sent on the raw session: PyGithub treats every POST as a write and
+        # spaces them a second apart, which would throttle read-only queries
+        url = self._graphql_url()
+        with github_request_duration.time(method="POST", endpoint=github_endpoint(url), status="error") as labels:
+            response = self._raw_session().post(url, json={"query": query, "variables": variables}, timeout=30)
+            labels["status"] = response.status_code
+        if self.conditional_cache:
+            self.conditional_cache._track_rate_limit(response, "graphql")
+        if response.status_code != 200:
+            raise RuntimeError(f"GitHub GraphQL returned {response.status_code}: {response.text[:200]}")
+        payload = response.json()
+        if payload.get("errors"):
+            raise RuntimeError(f"GitHub GraphQL errors: {payload['errors']}")
+        return payload["data"]
+
+    def invalidate(self, full_name=None):
+        with self._lock:
+            if full_name is None:
+                self._repos.clear()
+                self._org_repos.clear()
+            else:
+                self._repos.pop(full_name, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "repo_cache_hits": self._hits,
+                "repo_cache_misses": self._misses,
+                "repo_cache_hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+                "cached_repos": len(self._repos),
+                "pool_size": self.pool_size,
+                "conditional_cache": self.conditional_cache.stats() if self.conditional_cache else None,
+            }
+
+    def _raw_session(self):
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    session = requests.Session()
+                    adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                    session.mount("https://", adapter)
+                    session.mount("http://", adapter)
+                    session.headers["Authorization"] = f"token {self.token}"
+                    self._session = session
+        return self._session
+
+    def _graphql_url(self):
+        # api.github.com/graphql, or /api/graphql next to GitHub Enterprise's /api/v3
+        base = self.base_url.rstrip("/")
+        return base[:-len("/v3")] + "/graphql" if base.endswith("/api/v3") else base + "/graphql"
+
+    def _connect(self):
+        github = Github(
+            auth=Auth.Token(self.token),
+            base_url=self.base_url,
+            pool_size=self.pool_size,
+            seconds_between_requests=self.seconds_between_requests,
+            seconds_between_writes=self.seconds_between_writes,
+        )
+        # No public hook for the connection class, so swap it on this requester only
+        # (Requester.injectConnectionClasses would turn off connection reuse globally)
+        base = PooledHTTPSConnection if self.base_url.startswith("https://") else PooledHTTPConnection
+        github.requester._Requester__connectionClass = type(base.__name__, (base,), {"cache": self.conditional_cache})
+        return github
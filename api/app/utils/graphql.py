@@ -0,0 +1,151 @@
+import logging
+from datetime import datetime
+
+from app.config import github_clients
+
+OPEN_PRS_QUERY = """
+query OpenPullRequests($owner: String!, $name: String!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequests(states: OPEN, first: 100, after: $cursor, orderBy: {field: CREATED_AT, direction: DESC}) {
+      totalCount
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        number
+        title
+        author { login }
+        createdAt
+        updatedAt
+        mergeable
+      }
+    }
+  }
+}
+"""
+
+# Everything the merge gates look at, for one PR: the review decision plus each
+# reviewer's latest approving or blocking review, and the rollup of every commit
+# status, check run and workflow run on the head commit
+MERGE_STATE_FIELDS = """
+        number
+        title
+        author { login }
+        createdAt
+        updatedAt
+        isDraft
+        mergeable
+        headRefOid
+        reviewDecision
+        latestOpinionatedReviews(first: 100) { nodes { state } }
+        commits(last: 1) { nodes { commit { statusCheckRollup { state } } } }
+"""
+
+MERGE_STATES_QUERY = """
+query MergeStates($owner: String!, $name: String!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequests(states: OPEN, first: 50, after: $cursor, orderBy: {field: CREATED_AT, direction: DESC}) {
+      pageInfo { hasNextPage endCursor }
+      nodes {%s}
+    }
+  }
+}
+""" % MERGE_STATE_FIELDS
+
+MERGE_STATE_QUERY = """
+query MergeState($owner: String!, $name: String!, $number: Int!) {
+  repository(owner: $owner, name: $name) {
+    pullRequest(number: $number) {%s}
+  }
+}
+""" % MERGE_STATE_FIELDS
+
+# statusCheckRollup states in the combined-status vocabulary the merge gate uses;
+# a head with no checks at all counts as pending, like an empty combined status
+ROLLUP_STATES = {"SUCCESS": "success", "FAILURE": "failure", "ERROR": "failure", "PENDING": "pending", "EXPECTED": "pending"}
+
+# GraphQL reports UNKNOWN while GitHub is still computing, REST reports null
+MERGEABLE_STATES = {"MERGEABLE": True, "CONFLICTING": False}
+
+
+def to_isoformat(timestamp):
+    # Match the REST path, which serializes PyGithub's aware datetimes
+    return datetime.fromisoformat(timestamp.replace("Z", "+00:00")).isoformat()
+
+
+def list_open_prs(full_name):
+    owner, name = full_name.split("/", 1)
+    prs = []
+    cursor = None
+    pages = 0
+
+    while True:
+        data = github_clients.graphql(OPEN_PRS_QUERY, {"owner": owner, "name": name, "cursor": cursor})
+        pull_requests = data["repository"]["pullRequests"]
+        pages += 1
+
+        for node in pull_requests["nodes"]:
+            prs.append({
+                "number": node["number"],
+                "title": node["title"],
+                "user": node["author"]["login"] if node.get("author") else "ghost",
+                "created_at": to_isoformat(node["createdAt"]),
+                "updated_at": to_isoformat(node["updatedAt"]),
+                "mergeable": MERGEABLE_STATES.get(node["mergeable"])
+            })
+
+        if not pull_requests["pageInfo"]["hasNextPage"]:
+            break
+        cursor = pull_requests["pageInfo"]["endCursor"]
+
+    logging.info(f"✅ Retrieved {len(prs)} open PRs for {full_name} in {pages} GraphQL request(s).")
+    return prs
+
+
+def _merge_state(node):
+    approvals = sum(1 for review in node["latestOpinionatedReviews"]["nodes"] if review["state"] == "APPROVED")
+    # A branch protection rule that still wants reviews (or has changes requested) overrides the count
+    if node.get("reviewDecision") in ("CHANGES_REQUESTED", "REVIEW_REQUIRED"):
+        approvals = 0
+    commits = node["commits"]["nodes"]
+    rollup = commits[0]["commit"]["statusCheckRollup"] if commits else None
+    return {
+        "number": node["number"],
+        "title": node["title"],
+        "user": node["author"]["login"] if node.get("author") else "ghost",
+        "created_at": to_isoformat(node["createdAt"]),
+        "updated_at": to_isoformat(node["updatedAt"]),
+        "mergeable": MERGEABLE_STATES.get(node["mergeable"]),
+        "draft": node["isDraft"],
+        "head_sha": node["headRefOid"],
+        "review_decision": node.get("reviewDecision"),
+        "approvals": approvals,
+        "combined_status": ROLLUP_STATES.get(rollup["state"], "pending") if rollup else "pending",
+    }
+
+
+# Merge gate state of every open PR, 50 per request
+def list_merge_states(full_name):
+    owner, name = full_name.split("/", 1)
+    states = []
+    cursor = None
+    pages = 0
+
+    while True:
+        data = github_clients.graphql(MERGE_STATES_QUERY, {"owner": owner, "name": name, "cursor": cursor})
+        pull_requests = data["repository"]["pullRequests"]
+        pages += 1
+        states += [_merge_state(node) for node in pull_requests["nodes"]]
+        if not pull_requests["pageInfo"]["hasNextPage"]:
+            break
+        cursor = pull_requests["pageInfo"]["endCursor"]
+
+    logging.info(f"✅ Retrieved merge state of {len(states)} open PRs for {full_name} in {pages} GraphQL request(s).")
+    return states
+
+
+def merge_state(full_name, pr_number):
+    owner, name = full_name.split("/", 1)
+    data = github_clients.graphql(MERGE_STATE_QUERY, {"owner": owner, "name": name, "number": pr_number})
+    node = data["repository"]["pullRequest"]
+    if node is None:
+        raise RuntimeError(f"PR #{pr_number} not found in {full_name}")
+    return _merge_state(node)
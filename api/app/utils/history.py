@@ -0,0 +1,152 @@
+import logging
+import re
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+from app.config import REVIEW_HISTORY_PATH
+
+# Review wording that keeps a PR from being auto-merged
+NEGATIVE_TERMS = ["error", "issue", "unsafe", "not recommended", "don't merge"]
+
+VERDICT_PATTERN = re.compile(r"verdict:\s*(safe to merge|needs review)", re.IGNORECASE)
+
+
+# "safe" or "needs_review": the explicit verdict line when the review has one,
+# otherwise the wording check. The auto-merge gate refuses exactly the reviews
+# this calls needs_review, so the history and the merges never disagree.
+def review_verdict(review):
+    match = VERDICT_PATTERN.search(review or "")
+    if match:
+        return "safe" if match.group(1).lower() == "safe to merge" else "needs_review"
+    return "needs_review" if any(term in (review or "").lower() for term in NEGATIVE_TERMS) else "safe"
+
+
+def _isoformat(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts else None
+
+
+# Every generated review and merge decision, kept for the dashboard's history views
+class ReviewHistory:
+    def __init__(self, path):
+        self.path = path
+        self._db = None
+        self._lock = threading.Lock()
+
+    def record_review(self, repo_name, pr_number, author, title, head_sha, model, kind, review,
+                      latency=None, prompt_tokens=None, eval_tokens=None):
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                "INSERT INTO reviews (repo, pr_number, author, title, head_sha, model, kind, verdict, "
+                "latency, prompt_tokens, eval_tokens, review, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (repo_name, pr_number, author, title, head_sha, model, kind, review_verdict(review),
+                 latency, prompt_tokens, eval_tokens, review, time.time()),
+            )
+            db.commit()
+
+    def record_merge(self, repo_name, pr_number, head_sha, merged, message, latency=None):
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                "INSERT INTO merges (repo, pr_number, head_sha, merged, message, latency, created_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (repo_name, pr_number, head_sha, int(merged), message, latency, time.time()),
+            )
+            db.commit()
+
+    def reviews(self, repo_name=None, pr_number=None, author=None, verdict=None, since=None, until=None, limit=20, offset=0):
+        where, args = self._filters(repo=repo_name, pr_number=pr_number, author=author, verdict=verdict, since=since, until=until)
+        return self._page("reviews", where, args, limit, offset, self._review_row)
+
+    def review(self, review_id):
+        with self._lock:
+            row = self._connect().execute("SELECT * FROM reviews WHERE id = ?", (review_id,)).fetchone()
+        return self._review_row(row) if row else None
+
+    def merges(self, repo_name=None, pr_number=None, merged=None, since=None, until=None, limit=20, offset=0):
+        where, args = self._filters(
+            repo=repo_name, pr_number=pr_number, merged=None if merged is None else int(merged), since=since, until=until
+        )
+        return self._page("merges", where, args, limit, offset, self._merge_row)
+
+    def stats(self):
+        with self._lock:
+            db = self._connect()
+            return {
+                "reviews": db.execute("SELECT COUNT(*) FROM reviews").fetchone()[0],
+                "merges": db.execute("SELECT COUNT(*) FROM merges").fetchone()[0],
+            }
+
+    def _page(self, table, where, args, limit, offset, to_dict):
+        with self._lock:
+            db = self._connect()
+            total = db.execute(f"SELECT COUNT(*) FROM {table}{where}", args).fetchone()[0]
+            rows = db.execute(
+                f"SELECT * FROM {table}{where} ORDER BY created_at DESC, id DESC LIMIT ? OFFSET ?", args + [limit, offset]
+            ).fetchall()
+        return total, [to_dict(row) for row in rows]
+
+    @staticmethod
+    def _filters(since=None, until=None, **equal):
+        clauses, args = [], []
+        for column, value in equal.items():
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                args.append(value)
+        if since is not None:
+            clauses.append("created_at >= ?")
+            args.append(since)
+        if until is not None:
+            clauses.append("created_at < ?")
+            args.append(until)
+        return (" WHERE " + " AND ".join(clauses) if clauses else ""), args
+
+    @staticmethod
+    def _review_row(row):
+        review = dict(row)
+        review["created_at"] = _isoformat(review["created_at"])
+        return review
+
+    @staticmethod
+    def _merge_row(row):
+        merge = dict(row)
+        merge["merged"] = bool(merge["merged"])
+        merge["created_at"] = _isoformat(merge["created_at"])
+        return merge
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS reviews ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, repo TEXT NOT NULL, pr_number INTEGER NOT NULL, "
+                "author TEXT, title TEXT, head_sha TEXT NOT NULL, model TEXT NOT NULL, kind TEXT NOT NULL, "
+                "verdict TEXT NOT NULL, latency REAL, prompt_tokens INTEGER, eval_tokens INTEGER, "
+                "review TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS merges ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, repo TEXT NOT NULL, pr_number INTEGER NOT NULL, "
+                "head_sha TEXT, merged INTEGER NOT NULL, message TEXT, latency REAL, created_at REAL NOT NULL)"
+            )
+            # One index per filter the API offers, each ending in created_at for the newest-first ordering
+            for name, table, columns in (
+                ("idx_reviews_created", "reviews", "created_at"),
+                ("idx_reviews_repo", "reviews", "repo, created_at"),
+                ("idx_reviews_pr", "reviews", "repo, pr_number, created_at"),
+                ("idx_reviews_author", "reviews", "author, created_at"),
+                ("idx_reviews_verdict", "reviews", "verdict, created_at"),
+                ("idx_merges_created", "merges", "created_at"),
+                ("idx_merges_pr", "merges", "repo, pr_number, created_at"),
+            ):
+                self._db.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+            self._db.commit()
+            logging.info(f"✅ Opened review history at {self.path}")
+        return self._db
+
+
+review_history = ReviewHistory(REVIEW_HISTORY_PATH)
@@ -0,0 +1,204 @@
+import logging
+import threading
+import time
+import uuid
+from collections import OrderedDict, deque
+from datetime import datetime, timezone
+
+from app.config import REVIEW_WORKERS, REVIEW_QUEUE_SIZE, REVIEW_QUEUE_SIZE_PER_REPO, REVIEW_JOB_HISTORY
+
+
+class QueueFullError(RuntimeError):
+    pass
+
+
+def _isoformat(ts):
+    return datetime.fromtimestamp(ts, timezone.utc).isoformat() if ts else None
+
+
+# In-process job queue with a bounded worker pool. Jobs are queued per shard
+# (the repository) and workers take the next job from the shard with the fewest
+# running jobs, round-robin among ties, so one busy shard can't starve the rest.
+class JobQueue:
+    def __init__(self, name, workers, maxsize, history, shard_maxsize=None):
+        self.name = name
+        self.workers = max(1, workers)
+        self.maxsize = maxsize
+        self.shard_maxsize = shard_maxsize or maxsize
+        self.history = history
+        self._shards = OrderedDict()
+        self._running = {}
+        self._depth = 0
+        self._jobs = OrderedDict()
+        self._active = {}
+        self._lock = threading.Lock()
+        self._ready = threading.Condition(self._lock)
+        self._threads = []
+        self._busy = 0
+        self._counts = {"submitted": 0, "completed": 0, "failed": 0, "rejected": 0, "deduplicated": 0}
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+        self._run_total = 0.0
+        self._run_max = 0.0
+
+    # A job submitted with the key of a queued or running job is not queued
+    # again; the existing job is returned with "duplicate" set
+    def submit(self, kind, func, *args, shard=None, key=None, **kwargs):
+        job = {
+            "id": uuid.uuid4().hex,
+            "kind": kind,
+            "shard": shard,
+            "key": key,
+            "status": "queued",
+            "enqueued_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "result": None,
+            "error": None,
+        }
+
+        self._start_workers()
+        with self._lock:
+            if key is not None and key in self._active:
+                self._counts["deduplicated"] += 1
+                existing = self._active[key]
+                logging.info(f"Job {existing['id']} already covers {kind} {key}")
+                return {**self._public(existing), "duplicate": True}
+            if self._depth >= self.maxsize:
+                self._counts["rejected"] += 1
+                raise QueueFullError(f"{self.name} queue is full ({self.maxsize} jobs)")
+            pending = self._shards.setdefault(shard, deque())
+            if len(pending) >= self.shard_maxsize:
+                self._counts["rejected"] += 1
+                raise QueueFullError(f"{self.name} queue is full for {shard} ({self.shard_maxsize} jobs)")
+            pending.append((job, func, args, kwargs))
+            self._depth += 1
+            self._counts["submitted"] += 1
+            self._jobs[job["id"]] = job
+            if key is not None:
+                self._active[key] = job
+            self._trim()
+            self._ready.notify()
+            depth = self._depth
+
+        logging.info(f"📥 Queued {kind} job {job['id']} (depth {depth})")
+        return self._public(job)
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._public(job) if job else None
+
+    def stats(self):
+        with self._lock:
+            finished = self._counts["completed"] + self._counts["failed"]
+            started = finished + self._busy
+            return {
+                "name": self.name,
+                "workers": self.workers,
+                "busy": self._busy,
+                "depth": self._depth,
+                "capacity": self.maxsize,
+                "shards": {
+                    str(shard): {"depth": len(pending), "running": self._running.get(shard, 0)}
+                    for shard, pending in self._shards.items()
+                    if pending or self._running.get(shard)
+                },
+                **self._counts,
+                "avg_wait_time": round(self._wait_total / started, 3) if started else 0.0,
+                "max_wait_time": round(self._wait_max, 3),
+                "avg_run_time": round(self._run_total / finished, 3) if finished else 0.0,
+                "max_run_time": round(self._run_max, 3),
+            }
+
+    def _start_workers(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                thread = threading.Thread(target=self._work, name=f"{self.name}-worker-{i}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _next(self):
+        # Caller holds the lock. Least busy shard first; rotating the shard
+        # order after each pick makes ties round-robin.
+        while not self._depth:
+            self._ready.wait()
+        shard = min(
+            (shard for shard, pending in self._shards.items() if pending),
+            key=lambda shard: self._running.get(shard, 0),
+        )
+        self._shards.move_to_end(shard)
+        self._running[shard] = self._running.get(shard, 0) + 1
+        self._depth -= 1
+        return self._shards[shard].popleft()
+
+    def _work(self):
+        while True:
+            with self._lock:
+                job, func, args, kwargs = self._next()
+            started = time.time()
+            with self._lock:
+                job["status"] = "running"
+                job["started_at"] = started
+                wait = started - job["enqueued_at"]
+                self._wait_total += wait
+                self._wait_max = max(self._wait_max, wait)
+                self._busy += 1
+
+            try:
+                result, status, error = func(*args, **kwargs), "done", None
+            except Exception as e:
+                logging.error(f"❌ {job['kind']} job {job['id']} failed: {e}")
+                result, status, error = None, "failed", str(e)
+
+            finished = time.time()
+            with self._lock:
+                job.update(status=status, result=result, error=error, finished_at=finished)
+                run = finished - started
+                self._run_total += run
+                self._run_max = max(self._run_max, run)
+                self._busy -= 1
+                if job["key"] is not None:
+                    self._active.pop(job["key"], None)
+                self._running[job["shard"]] -= 1
+                if not self._running[job["shard"]]:
+                    del self._running[job["shard"]]
+                    if not self._shards[job["shard"]]:
+                        del self._shards[job["shard"]]
+                self._counts["completed" if status == "done" else "failed"] += 1
+
+            logging.info(f"✅ {job['kind']} job {job['id']} {status} (waited {wait:.2f}s, ran {run:.2f}s)")
+
+    def _trim(self):
+        # Drop the oldest finished jobs once the history limit is reached
+        excess = len(self._jobs) - self.history
+        for job_id in list(self._jobs):
+            if excess <= 0:
+                break
+            if self._jobs[job_id]["status"] in ("done", "failed"):
+                del self._jobs[job_id]
+                excess -= 1
+
+    @staticmethod
+    def _public(job):
+        end = job["finished_at"] or time.time()
+        return {
+            "id": job["id"],
+            "kind": job["kind"],
+            "shard": job["shard"],
+            "status": job["status"],
+            "enqueued_at": _isoformat(job["enqueued_at"]),
+            "started_at": _isoformat(job["started_at"]),
+            "finished_at": _isoformat(job["finished_at"]),
+            "wait_time": round((job["started_at"] or end) - job["enqueued_at"], 3),
+            "run_time": round(end - job["started_at"], 3) if job["started_at"] else None,
+            "result": job["result"],
+            "error": job["error"],
+        }
+
+
+review_jobs = JobQueue("review", REVIEW_WORKERS, REVIEW_QUEUE_SIZE, REVIEW_JOB_HISTORY, REVIEW_QUEUE_SIZE_PER_REPO)
@@ -0,0 +1,324 @@
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+import ollama
+
+from app.config import (
+    OLLAMA_MODELS, OLLAMA_MODEL_TTL, LLM_CONCURRENCY, OLLAMA_KEEP_ALIVE, OLLAMA_MODEL_OPTIONS,
+    REVIEW_NUM_CTX, REVIEW_RESPONSE_TOKENS,
+)
+from .metrics import ollama_chat_duration, llm_queue_wait, record_ollama_usage, ollama_load_duration, ollama_cold_starts
+
+# Dashboard requests someone is waiting on go ahead of webhook reviews
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+PRIORITIES = (INTERACTIVE, BACKGROUND)
+
+# A call whose load_duration exceeds this had to load the model first
+COLD_LOAD_SECONDS = 0.5
+
+
+# num_ctx and num_predict for a model: OLLAMA_MODEL_OPTIONS by exact name, then
+# by name without the tag, over the REVIEW_NUM_CTX / REVIEW_RESPONSE_TOKENS defaults.
+# Every call to a model must send the same num_ctx, or Ollama reloads it.
+def model_options(model):
+    configured = OLLAMA_MODEL_OPTIONS.get(model) or OLLAMA_MODEL_OPTIONS.get(model.split(":", 1)[0]) or {}
+    return {"num_ctx": REVIEW_NUM_CTX, "num_predict": REVIEW_RESPONSE_TOKENS, **configured}
+
+
+# System prompt first so consecutive reviews share a prefix Ollama can reuse
+def chat_messages(system, prompt):
+    return [{"role": "system", "content": system}, {"role": "user", "content": prompt}]
+
+
+# Caches Ollama's model catalog and resolves the configured preference list
+# against it, refreshing in the background instead of on every review
+class ModelResolver:
+    def __init__(self, preferences, ttl):
+        self.preferences = preferences
+        self.ttl = ttl
+        self._catalog = None
+        self._model = None
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._refresher = None
+        self._refreshes = 0
+        self._hits = 0
+        self._invalidations = 0
+
+    def resolve(self):
+        with self._lock:
+            if self._model is not None:
+                self._hits += 1
+                return self._model
+        self.refresh()
+        self._start_refresher()
+        return self._model
+
+    def refresh(self):
+        model_list = ollama.list()
+        catalog = [info.get("model") or info.get("name") for info in model_list.get("models", [])]
+        model = self._pick(catalog)
+        with self._lock:
+            if model != self._model:
+                logging.info(f"Using Ollama model {model} (available: {', '.join(catalog) or 'none'})")
+            self._catalog = catalog
+            self._model = model
+            self._fetched_at = time.time()
+            self._refreshes += 1
+        return model
+
+    def invalidate(self):
+        with self._lock:
+            self._model = None
+            self._catalog = None
+            self._invalidations += 1
+        logging.warning("⚠️ Ollama model catalog invalidated")
+
+    def stats(self):
+        with self._lock:
+            return {
+                "model": self._model,
+                "catalog": self._catalog,
+                "age": round(time.time() - self._fetched_at, 1) if self._fetched_at else None,
+                "hits": self._hits,
+                "refreshes": self._refreshes,
+                "invalidations": self._invalidations,
+            }
+
+    def _pick(self, catalog):
+        # "llama3.2" matches "llama3.2" and any tag of it such as "llama3.2:latest"
+        for preferred in self.preferences:
+            for name in catalog:
+                if name == preferred or name.split(":", 1)[0] == preferred:
+                    return name
+        if catalog:
+            logging.info(f"None of {', '.join(self.preferences)} found, using {catalog[0]} instead")
+            return catalog[0]
+        return self.preferences[0]
+
+    def _start_refresher(self):
+        with self._lock:
+            if self._refresher is not None:
+                return
+            self._refresher = threading.Thread(target=self._refresh_loop, name="ollama-models", daemon=True)
+        self._refresher.start()
+
+    def _refresh_loop(self):
+        while True:
+            time.sleep(self.ttl)
+            try:
+                self.refresh()
+            except Exception as e:
+                logging.warning(f"⚠️ Could not refresh Ollama model catalog: {e}")
+
+
+model_resolver = ModelResolver(OLLAMA_MODELS, OLLAMA_MODEL_TTL)
+
+
+# Limits concurrent Ollama generations. Waiting calls are served by priority
+# class, then round-robin across repositories and, within a repository, across
+# PR authors, so one busy repo or prolific author can't monopolize the model.
+class LLMScheduler:
+    def __init__(self, concurrency):
+        self.concurrency = max(1, concurrency)
+        self._lock = threading.Lock()
+        self._running = 0
+        self._waiting = {priority: OrderedDict() for priority in PRIORITIES}
+        self._depth = 0
+        self._waits = {priority: {"granted": 0, "wait_total": 0.0, "wait_max": 0.0} for priority in PRIORITIES}
+
+    def acquire(self, priority=BACKGROUND, tenant=None):
+        # tenant is (repo, author); returns the seconds spent waiting
+        repo_name, author = tenant or ("", "")
+        started = time.perf_counter()
+        with self._lock:
+            if self._running < self.concurrency and not self._depth:
+                self._running += 1
+                ticket = None
+            else:
+                ticket = threading.Event()
+                authors = self._waiting[priority].setdefault(repo_name, OrderedDict())
+                authors.setdefault(author, deque()).append(ticket)
+                self._depth += 1
+
+        if ticket is not None:
+            ticket.wait()
+        wait = time.perf_counter() - started
+        with self._lock:
+            stats = self._waits[priority]
+            stats["granted"] += 1
+            stats["wait_total"] += wait
+            stats["wait_max"] = max(stats["wait_max"], wait)
+        llm_queue_wait.observe(wait, priority=priority)
+        if wait > 1:
+            logging.info(f"Waited {wait:.2f}s for an Ollama slot ({priority}, {repo_name or 'unknown repo'})")
+        return wait
+
+    def release(self):
+        with self._lock:
+            ticket = self._next()
+            if ticket is None:
+                self._running -= 1
+            else:
+                # Hand the slot straight to the next caller
+                ticket.set()
+
+    def stats(self):
+        with self._lock:
+            return {
+                "concurrency": self.concurrency,
+                "running": self._running,
+                "waiting": {
+                    priority: sum(len(q) for authors in repos.values() for q in authors.values())
+                    for priority, repos in self._waiting.items()
+                },
+                "wait": {
+                    priority: {
+                        "granted": stats["granted"],
+                        "avg_wait_time": round(stats["wait_total"] / stats["granted"], 3) if stats["granted"] else 0.0,
+                        "max_wait_time": round(stats["wait_max"], 3),
+                    }
+                    for priority, stats in self._waits.items()
+                },
+            }
+
+    def _next(self):
+        for priority in PRIORITIES:
+            repos = self._waiting[priority]
+            if not repos:
+                continue
+            repo_name, authors = next(iter(repos.items()))
+            author, tickets = next(iter(authors.items()))
+            ticket = tickets.popleft()
+            if tickets:
+                authors.move_to_end(author)
+            else:
+                del authors[author]
+            if authors:
+                repos.move_to_end(repo_name)
+            else:
+                del repos[repo_name]
+            self._depth -= 1
+            return ticket
+        return None
+
+
+llm_scheduler = LLMScheduler(LLM_CONCURRENCY)
+
+
+def _is_model_missing(err):
+    return isinstance(err, ollama.ResponseError) and err.status_code == 404
+
+
+# Latency of calls that found the model loaded versus ones that had to load it
+class ModelStartStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._starts = {start: {"calls": 0, "latency_total": 0.0, "load_total": 0.0} for start in ("cold", "warm")}
+        self._last_cold = None
+
+    def record(self, model, response, latency):
+        load = (response.get("load_duration") or 0) / 1e9
+        start = "cold" if load > COLD_LOAD_SECONDS else "warm"
+        ollama_load_duration.observe(load, model=model)
+        if start == "cold":
+            ollama_cold_starts.inc(model=model)
+            logging.info(f"Ollama loaded {model} in {load:.2f}s before answering")
+        with self._lock:
+            stats = self._starts[start]
+            stats["calls"] += 1
+            stats["latency_total"] += latency
+            stats["load_total"] += load
+            if start == "cold":
+                self._last_cold = time.time()
+
+    def stats(self):
+        with self._lock:
+            return {
+                **{
+                    start: {
+                        "calls": stats["calls"],
+                        "avg_latency": round(stats["latency_total"] / stats["calls"], 3) if stats["calls"] else 0.0,
+                        "avg_load": round(stats["load_total"] / stats["calls"], 3) if stats["calls"] else 0.0,
+                    }
+                    for start, stats in self._starts.items()
+                },
+                "last_cold_start": round(time.time() - self._last_cold, 1) if self._last_cold else None,
+                "keep_alive": OLLAMA_KEEP_ALIVE,
+            }
+
+
+model_starts = ModelStartStats()
+
+
+def _stream(model, chunks, started):
+    status = "error"
+    try:
+        for chunk in chunks:
+            if chunk.get("done"):
+                record_ollama_usage(model, chunk)
+                model_starts.record(model, chunk, time.perf_counter() - started)
+                status = "ok"
+            yield chunk
+    except GeneratorExit:
+        status = "cancelled"
+        raise
+    except Exception as err:
+        if _is_model_missing(err):
+            model_resolver.invalidate()
+        raise
+    finally:
+        llm_scheduler.release()
+        ollama_chat_duration.observe(time.perf_counter() - started, model=model, stream="true", status=status)
+
+
+# ollama.chat behind the scheduler, with the model's options and the configured
+# keep_alive; drops the cached catalog when the model has disappeared and records
+# timing, token usage and cold starts. A streamed chat holds its slot until the
+# stream is exhausted or closed.
+def chat(model, messages, options=None, stream=False, priority=BACKGROUND, tenant=None):
+    options = {**model_options(model), **(options or {})}
+    llm_scheduler.acquire(priority, tenant)
+    started = time.perf_counter()
+    try:
+        response = ollama.chat(model=model, messages=messages, options=options, stream=stream, keep_alive=OLLAMA_KEEP_ALIVE)
+    except Exception as err:
+        llm_scheduler.release()
+        if _is_model_missing(err):
+            model_resolver.invalidate()
+        ollama_chat_duration.observe(time.perf_counter() - started, model=model, stream=str(stream).lower(), status="error")
+        raise
+    if stream:
+        return _stream(model, response, started)
+    llm_scheduler.release()
+    ollama_chat_duration.observe(time.perf_counter() - started, model=model, stream="false", status="ok")
+    record_ollama_usage(model, response)
+    model_starts.record(model, response, time.perf_counter() - started)
+    return response
+
+
+_warmup_lock = threading.Lock()
+_warmup_started = False
+
+
+# Load the model in the background at startup and evaluate the system prompt
+# once, so the first review neither waits for the load nor for the shared prefix
+def start_warmup(system_prompt):
+    global _warmup_started
+    with _warmup_lock:
+        if _warmup_started:
+            return
+        _warmup_started = True
+    threading.Thread(target=_warm_up, args=(system_prompt,), name="ollama-warmup", daemon=True).start()
+
+
+def _warm_up(system_prompt):
+    try:
+        model = model_resolver.resolve()
+        started = time.perf_counter()
+        chat(model, chat_messages(system_prompt, "Reply with OK."), options={"num_predict": 1})
+        logging.info(f"✅ Warmed up {model} in {time.perf_counter() - started:.2f}s (keep_alive {OLLAMA_KEEP_ALIVE})")
+    except Exception as e:
+        logging.warning(f"⚠️ Could not warm up the Ollama model: {e}")
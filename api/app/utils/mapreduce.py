@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.config import REVIEW_RESPONSE_TOKENS, REVIEW_CHUNK_TOKENS, REVIEW_MAP_PARALLELISM
+from .diffpack import pack_diff, estimate_tokens, file_priority, file_tokens
+from .llm import chat, chat_messages, model_options, BACKGROUND
+from .review_cache import prompt_hash
+from .metrics import token_usage
+
+# Part numbers live in the user message so every chunk shares the same system prefix
+MAP_SYSTEM_PROMPT = """
+            You are an AI code reviewer analyzing one part of a large GitHub pull request.
+            1. Identify significant logic changes in these files.
+            2. Summarize them concisely in 80 words or less.
+            3. List concrete problems or risks you see, if any.
+        """
+MAP_PROMPT_TEMPLATE = """
+            Part {part} of {parts}
+            PR Title: {title}
+
+            File Changes:
+            {diff_content}
+        """
+
+REDUCE_SYSTEM_PROMPT = """
+            You are an AI code reviewer. A large GitHub pull request was reviewed in parts; the partial reviews follow.
+            1. Merge them into one summary of the whole PR in 100 words or less.
+            2. Provide constructive feedback and highlight potential improvements.
+            3. Assess if this PR is safe to merge automatically and end with a line "Verdict: SAFE TO MERGE" or "Verdict: NEEDS REVIEW".
+        """
+REDUCE_PROMPT_TEMPLATE = """
+            Reviewed in {parts} parts
+            PR Title: {title}
+            PR Description: {description}
+
+            Partial Reviews:
+            {partial_reviews}
+        """
+MAP_REDUCE_PROMPT_HASH = prompt_hash(MAP_SYSTEM_PROMPT + MAP_PROMPT_TEMPLATE + REDUCE_SYSTEM_PROMPT + REDUCE_PROMPT_TEMPLATE)
+
+
+# Timings of the most recent map-reduce reviews
+class MapReduceStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._runs = 0
+        self._chunks = 0
+        self._last = None
+
+    def record(self, timings):
+        with self._lock:
+            self._runs += 1
+            self._chunks += timings["chunks"]
+            self._last = timings
+
+    def stats(self):
+        with self._lock:
+            return {"runs": self._runs, "chunks": self._chunks, "last": self._last}
+
+
+mapreduce_stats = MapReduceStats()
+
+
+# Group files into chunks of roughly chunk_tokens, keeping related paths together
+def chunk_files(files, chunk_tokens):
+    chunks = []
+    current, current_tokens = [], 0
+    for file in sorted(files, key=lambda f: (file_priority(f.filename), f.filename)):
+        tokens = file_tokens(file)
+        if current and current_tokens + tokens > chunk_tokens:
+            chunks.append(current)
+            current, current_tokens = [], 0
+        current.append(file)
+        current_tokens += tokens
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _ask(model, system, prompt, priority, tenant):
+    response = chat(
+        model=model,
+        messages=chat_messages(system, prompt),
+        options={"timeout": 120},
+        priority=priority,
+        tenant=tenant
+    )
+    content = response["message"]["content"] if response and "message" in response else ""
+    if not content:
+        raise RuntimeError("Ollama returned empty content")
+    return content, token_usage(response)
+
+
+# Review each chunk in parallel, then merge the partial reviews in one reduce call.
+# Returns (review, None, token usage) or (None, error message, None) like generate_review.
+def map_reduce_review(pr_number, pr, files, model, chunk_tokens=REVIEW_CHUNK_TOKENS, parallelism=REVIEW_MAP_PARALLELISM,
+                      priority=BACKGROUND, tenant=None):
+    started = time.perf_counter()
+    chunks = chunk_files(files, chunk_tokens)
+    timings = {"chunks": len(chunks), "files": len(files), "parallelism": parallelism, "map": [], "reduce": None}
+    logging.info(f"Reviewing PR #{pr_number} in {len(chunks)} chunk(s) of ~{chunk_tokens} tokens with parallelism {parallelism}")
+
+    def review_chunk(index, chunk):
+        chunk_started = time.perf_counter()
+        packed = pack_diff(chunk, chunk_tokens)
+        prompt = MAP_PROMPT_TEMPLATE.format(part=index + 1, parts=len(chunks), title=pr.title, diff_content=packed["content"])
+        content, usage = _ask(model, MAP_SYSTEM_PROMPT, prompt, priority, tenant)
+        elapsed = round(time.perf_counter() - chunk_started, 3)
+        logging.info(f"PR #{pr_number} chunk {index + 1}/{len(chunks)} reviewed in {elapsed}s")
+        return content, elapsed, usage
+
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, parallelism)) as pool:
+            results = list(pool.map(lambda args: review_chunk(*args), enumerate(chunks)))
+        timings["map"] = [elapsed for _, elapsed, _ in results]
+        timings["map_total"] = round(time.perf_counter() - started, 3)
+
+        reduce_started = time.perf_counter()
+        # Give every partial review an equal share of the reduce prompt
+        options = model_options(model)
+        response_tokens = options["num_predict"] if options["num_predict"] > 0 else REVIEW_RESPONSE_TOKENS
+        room = options["num_ctx"] - response_tokens - estimate_tokens(REDUCE_SYSTEM_PROMPT + REDUCE_PROMPT_TEMPLATE + (pr.body or ""))
+        max_chars = max(room * 4 // len(results), 200)
+        partial_reviews = "\n\n".join(
+            f"Part {i + 1}:\n{content[:max_chars]}" for i, (content, _, _) in enumerate(results)
+        )
+        prompt = REDUCE_PROMPT_TEMPLATE.format(
+            parts=len(chunks),
+            title=pr.title,
+            description=pr.body if pr.body else 'No description provided',
+            partial_reviews=partial_reviews
+        )
+        review_content, reduce_usage = _ask(model, REDUCE_SYSTEM_PROMPT, prompt, priority, tenant)
+        timings["reduce"] = round(time.perf_counter() - reduce_started, 3)
+    except Exception as ollama_err:
+        logging.error(f"❌ Ollama error during map-reduce review of PR #{pr_number}: {ollama_err}")
+        return None, f"Error with Ollama: {ollama_err}", None
+    finally:
+        timings["total"] = round(time.perf_counter() - started, 3)
+        mapreduce_stats.record(timings)
+
+    logging.info(f"✅ Generated map-reduce review for PR #{pr_number} in {timings['total']}s: {review_content[:100]}...")
+    # Token counts cover every map call plus the reduce call
+    usage = {
+        name: sum(chunk_usage[name] for _, _, chunk_usage in results) + reduce_usage[name]
+        for name in ("prompt_tokens", "eval_tokens")
+    }
+    return review_content, None, usage
@@ -0,0 +1,213 @@
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+# Seconds; covers quick GitHub reads up to multi-minute reviews
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()):
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _number(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+# Minimal Prometheus metric types; values are kept per label tuple
+class Counter:
+    kind = "counter"
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, _labels(self.labelnames, key), value) for key, value in self._values.items()]
+
+
+class Histogram:
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    @contextmanager
+    def time(self, **labels):
+        # Labels may be filled in by the block (e.g. the response status)
+        started = time.perf_counter()
+        try:
+            yield labels
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def samples(self):
+        with self._lock:
+            values = [(key, list(counts), total) for key, (counts, total) in self._values.items()]
+        samples = []
+        for key, counts, total in values:
+            for bound, count in zip(self.buckets, counts):
+                samples.append((f"{self.name}_bucket", _labels(self.labelnames, key, [("le", _number(bound))]), count))
+            samples.append((f"{self.name}_sum", _labels(self.labelnames, key), total))
+            samples.append((f"{self.name}_count", _labels(self.labelnames, key), counts[-1]))
+        return samples
+
+
+# Reads its value from a callback at scrape time; with labelnames the callback
+# returns a dict of label tuple -> value
+class Gauge:
+    kind = "gauge"
+
+    def __init__(self, name, documentation, callback, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labelnames = tuple(labelnames)
+
+    def samples(self):
+        value = self.callback()
+        if value is None:
+            return []
+        if not self.labelnames:
+            return [(self.name, "", value)]
+        return [(self.name, _labels(self.labelnames, key), v) for key, v in value.items() if v is not None]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, callback, labelnames=()):
+        return self.register(Gauge(name, documentation, callback, labelnames))
+
+    def render(self):
+        # Prometheus text exposition format 0.0.4
+        with self._lock:
+            metrics = list(self._metrics)
+        lines = []
+        for metric in metrics:
+            try:
+                samples = metric.samples()
+            except Exception:
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(f"{name}{labels} {_number(value)}" for name, labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "Time to handle an API request", ("method", "route", "status")
+)
+github_request_duration = registry.histogram(
+    "github_request_duration_seconds", "Time of each GitHub API call", ("method", "endpoint", "status")
+)
+ollama_chat_duration = registry.histogram(
+    "ollama_chat_duration_seconds", "Time of each Ollama chat call, start to last token", ("model", "stream", "status")
+)
+ollama_prompt_tokens = registry.counter(
+    "ollama_prompt_tokens_total", "Prompt tokens evaluated by Ollama", ("model",)
+)
+ollama_eval_tokens = registry.counter(
+    "ollama_eval_tokens_total", "Tokens generated by Ollama", ("model",)
+)
+ollama_tokens_per_second = registry.histogram(
+    "ollama_eval_tokens_per_second", "Generation speed reported by Ollama", ("model",),
+    buckets=(1, 2, 5, 10, 20, 30, 50, 75, 100, 150, 200, 500),
+)
+ollama_load_duration = registry.histogram(
+    "ollama_load_duration_seconds", "Time Ollama spent loading the model before a call", ("model",)
+)
+ollama_cold_starts = registry.counter(
+    "ollama_cold_starts_total", "Ollama calls that had to load the model first", ("model",)
+)
+llm_queue_wait = registry.histogram(
+    "llm_queue_wait_seconds", "Time Ollama calls waited for a scheduler slot", ("priority",)
+)
+discord_post_duration = registry.histogram(
+    "discord_post_duration_seconds", "Time of each Discord webhook post", ("status",)
+)
+
+# Numbers, SHAs and ref names in GitHub URLs would give every call its own series
+_GITHUB_PATH_PATTERNS = [
+    (re.compile(r"^/repos/[^/]+/[^/]+"), "/repos/{owner}/{repo}"),
+    (re.compile(r"^/orgs/[^/]+"), "/orgs/{org}"),
+    (re.compile(r"/commits/[^/]+"), "/commits/{ref}"),
+    (re.compile(r"/compare/[^/]+"), "/compare/{basehead}"),
+    (re.compile(r"/[0-9a-f]{40}(?=/|$)"), "/{sha}"),
+    (re.compile(r"/\d+(?=/|$)"), "/{id}"),
+]
+
+
+def github_endpoint(url):
+    path = re.sub(r"^[a-z]+://[^/]+", "", url).split("?", 1)[0]
+    path = re.sub(r"^/api/v3(?=/)", "", path)
+    for pattern, replacement in _GITHUB_PATH_PATTERNS:
+        path = pattern.sub(replacement, path)
+    return path or "/"
+
+
+# Token counts and speed from a finished Ollama response (or the last streamed chunk)
+def record_ollama_usage(model, response):
+    prompt_tokens = response.get("prompt_eval_count") or 0
+    eval_tokens = response.get("eval_count") or 0
+    eval_duration = response.get("eval_duration") or 0
+    ollama_prompt_tokens.inc(prompt_tokens, model=model)
+    ollama_eval_tokens.inc(eval_tokens, model=model)
+    if eval_tokens and eval_duration:
+        ollama_tokens_per_second.observe(eval_tokens / (eval_duration / 1e9), model=model)
+
+
+# Prompt and generated token counts of an Ollama response, for the review history
+def token_usage(response):
+    return {
+        "prompt_tokens": response.get("prompt_eval_count") or 0,
+        "eval_tokens": response.get("eval_count") or 0,
+    }
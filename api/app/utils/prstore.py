@@ -0,0 +1,213 @@
+import logging
+import threading
+import time
+
+from app.config import PR_STORE_TTL
+from .graphql import to_isoformat
+
+
+def _combined_state(statuses):
+    # Same rules as GitHub's combined status endpoint
+    states = set(statuses.values())
+    if states & {"error", "failure"}:
+        return "failure"
+    if not states or "pending" in states:
+        return "pending"
+    return "success"
+
+
+# In-memory PR state per (repo, PR number), kept current from webhook payloads
+# and bootstrapped from the API, so listing and merge gates don't poll GitHub
+class PRStateStore:
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self._prs = {}
+        self._listed_at = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+        self._events = 0
+
+    # --- listing ---
+
+    def list_open(self, repo_name):
+        with self._lock:
+            listed_at = self._listed_at.get(repo_name)
+            if listed_at is None or time.time() - listed_at > self.ttl:
+                self._misses += 1
+                return None
+            self._hits += 1
+            prs = [self._summary(entry) for (name, _), entry in self._prs.items() if name == repo_name]
+        return sorted(prs, key=lambda pr: pr["created_at"], reverse=True)
+
+    def bootstrap(self, repo_name, prs):
+        now = time.time()
+        with self._lock:
+            for key in [key for key in self._prs if key[0] == repo_name]:
+                if key[1] not in {pr["number"] for pr in prs}:
+                    del self._prs[key]
+            for pr in prs:
+                entry = self._prs.setdefault((repo_name, pr["number"]), self._new_entry())
+                entry.update({k: pr[k] for k in ("number", "title", "user", "created_at", "updated_at", "mergeable")})
+            self._listed_at[repo_name] = now
+        logging.info(f"✅ PR store bootstrapped with {len(prs)} open PRs for {repo_name}")
+
+    # --- merge gates ---
+
+    # Reviews and statuses each carry the time they were last loaded from the API or
+    # updated by a webhook; past the TTL they are fetched again, in case the
+    # corresponding webhooks aren't subscribed
+    def approvals(self, repo_name, pr_number):
+        with self._lock:
+            entry = self._fresh(repo_name, pr_number, "reviews")
+            if entry is None:
+                self._misses += 1
+                return None
+            self._hits += 1
+            return sum(1 for state in entry["reviews"].values() if state == "APPROVED")
+
+    def set_reviews(self, repo_name, pr_number, reviews):
+        # Only each reviewer's latest review counts
+        latest = {}
+        for review in reviews:
+            if review.user and review.state != "COMMENTED":
+                latest[review.user.login] = review.state
+        with self._lock:
+            entry = self._prs.get((repo_name, pr_number))
+            if entry is not None:
+                entry.update(reviews=latest, reviews_at=time.time())
+
+    def combined_status(self, repo_name, pr_number, sha):
+        with self._lock:
+            entry = self._fresh(repo_name, pr_number, "statuses")
+            if entry is None or entry["head_sha"] != sha:
+                self._misses += 1
+                return None
+            self._hits += 1
+            return _combined_state(entry["statuses"])
+
+    def set_statuses(self, repo_name, pr_number, sha, statuses):
+        with self._lock:
+            entry = self._prs.get((repo_name, pr_number))
+            if entry is not None and entry["head_sha"] == sha:
+                entry.update(statuses={status.context: status.state for status in statuses}, statuses_at=time.time())
+
+    def track(self, repo_name, pr):
+        # Make sure a PR loaded through the API has an entry the gates can fill in;
+        # only the PR's own fields are refreshed, not the reviews and statuses
+        with self._lock:
+            entry = self._prs.setdefault((repo_name, pr.number), self._new_entry())
+            if entry["head_sha"] != pr.head.sha:
+                entry.update(head_sha=pr.head.sha, statuses=None, statuses_at=0.0)
+            entry.update(
+                number=pr.number,
+                title=pr.title,
+                user=pr.user.login,
+                created_at=pr.created_at.isoformat(),
+                updated_at=pr.updated_at.isoformat(),
+                mergeable=pr.mergeable,
+            )
+
+    # --- webhook events ---
+
+    def apply_event(self, repo_name, event_type, payload):
+        with self._lock:
+            self._events += 1
+            if event_type == "pull_request":
+                self._apply_pull_request(repo_name, payload)
+            elif event_type == "pull_request_review":
+                self._apply_review(repo_name, payload)
+            elif event_type == "status":
+                self._apply_status(repo_name, payload)
+
+    def invalidate(self, repo_name=None):
+        # Drop the stored state so the next listing and gate checks go back to GitHub
+        with self._lock:
+            if repo_name is None:
+                self._prs.clear()
+                self._listed_at.clear()
+            else:
+                for key in [key for key in self._prs if key[0] == repo_name]:
+                    del self._prs[key]
+                self._listed_at.pop(repo_name, None)
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "prs": len(self._prs),
+                "repos": len(self._listed_at),
+                "events": self._events,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+            }
+
+    def _apply_pull_request(self, repo_name, payload):
+        data = payload.get("pull_request") or {}
+        key = (repo_name, data.get("number"))
+        if key[1] is None:
+            return
+        if payload.get("action") == "closed" or data.get("state") == "closed":
+            self._prs.pop(key, None)
+            return
+
+        entry = self._prs.setdefault(key, self._new_entry())
+        head_sha = (data.get("head") or {}).get("sha")
+        if head_sha and head_sha != entry["head_sha"]:
+            # New head: statuses belong to the old commit, and GitHub recomputes mergeability
+            entry.update(head_sha=head_sha, statuses=None, statuses_at=0.0, mergeable=None)
+        # Most events carry mergeable: null while GitHub computes it; keep the last known value
+        if data.get("mergeable") is not None:
+            entry["mergeable"] = data["mergeable"]
+        entry.update(
+            number=data["number"],
+            title=data.get("title"),
+            user=(data.get("user") or {}).get("login", "ghost"),
+            created_at=to_isoformat(data["created_at"]) if data.get("created_at") else entry["created_at"],
+            updated_at=to_isoformat(data["updated_at"]) if data.get("updated_at") else entry["updated_at"],
+        )
+
+    def _apply_review(self, repo_name, payload):
+        review = payload.get("review") or {}
+        entry = self._prs.get((repo_name, (payload.get("pull_request") or {}).get("number")))
+        login = (review.get("user") or {}).get("login")
+        # Until the full review list was loaded once, a single event can't give the approval count
+        if entry is None or entry["reviews"] is None or not login:
+            return
+        state = (review.get("state") or "").upper()
+        if payload.get("action") == "dismissed":
+            state = "DISMISSED"
+        if state and state != "COMMENTED":
+            entry["reviews"][login] = state
+            entry["reviews_at"] = time.time()
+
+    def _apply_status(self, repo_name, payload):
+        sha = payload.get("sha")
+        for entry in self._prs_for_sha(repo_name, sha):
+            if entry["statuses"] is not None:
+                entry["statuses"][payload.get("context")] = payload.get("state")
+                entry["statuses_at"] = time.time()
+
+    def _prs_for_sha(self, repo_name, sha):
+        return [entry for (name, _), entry in self._prs.items() if name == repo_name and sha and entry["head_sha"] == sha]
+
+    def _fresh(self, repo_name, pr_number, field):
+        entry = self._prs.get((repo_name, pr_number))
+        if entry is None or entry[field] is None or time.time() - entry[f"{field}_at"] > self.ttl:
+            return None
+        return entry
+
+    @staticmethod
+    def _new_entry():
+        return {
+            "number": None, "title": None, "user": None, "created_at": None, "updated_at": None,
+            "mergeable": None, "head_sha": None, "reviews": None, "reviews_at": 0.0, "statuses": None, "statuses_at": 0.0,
+        }
+
+    @staticmethod
+    def _summary(entry):
+        return {k: entry[k] for k in ("number", "title", "user", "created_at", "updated_at", "mergeable")}
+
+
+pr_store = PRStateStore(PR_STORE_TTL)
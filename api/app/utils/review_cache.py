@@ -0,0 +1,106 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import time
+
+from app.config import REVIEW_CACHE_PATH, REVIEW_CACHE_TTL, REVIEW_CACHE_MAX_ENTRIES
+
+
+def prompt_hash(template):
+    return hashlib.sha256(template.encode("utf-8")).hexdigest()[:16]
+
+
+# Persistent review cache keyed by (repo, PR, head SHA, model, prompt template)
+class ReviewCache:
+    def __init__(self, path, ttl, max_entries):
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._db = None
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+
+    @staticmethod
+    def make_key(repo_name, pr_number, head_sha, model, template_hash):
+        raw = f"{repo_name}\0{pr_number}\0{head_sha}\0{model}\0{template_hash}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            row = db.execute(
+                "SELECT review, created_at FROM review_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None or now - row[1] > self.ttl:
+                self._misses += 1
+                return None
+            db.execute("UPDATE review_cache SET accessed_at = ? WHERE key = ?", (now, key))
+            db.commit()
+            self._hits += 1
+            return row[0]
+
+    def latest(self, repo_name, pr_number):
+        # Most recent review of the PR at any head, as (head_sha, review)
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT head_sha, review FROM review_cache WHERE repo = ? AND pr_number = ? AND created_at >= ? "
+                "ORDER BY created_at DESC LIMIT 1",
+                (repo_name, pr_number, time.time() - self.ttl),
+            ).fetchone()
+            return (row[0], row[1]) if row else None
+
+    def put(self, key, repo_name, pr_number, head_sha, model, template_hash, review):
+        now = time.time()
+        with self._lock:
+            db = self._connect()
+            db.execute(
+                "INSERT OR REPLACE INTO review_cache "
+                "(key, repo, pr_number, head_sha, model, prompt_hash, review, created_at, accessed_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, repo_name, pr_number, head_sha, model, template_hash, review, now, now),
+            )
+            self._evict(db, now)
+            db.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self._hits + self._misses
+            entries = self._connect().execute("SELECT COUNT(*) FROM review_cache").fetchone()[0]
+            return {
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 3) if lookups else 0.0,
+                "entries": entries,
+                "max_entries": self.max_entries,
+            }
+
+    def _evict(self, db, now):
+        # Expire by TTL first, then trim the least recently used entries
+        db.execute("DELETE FROM review_cache WHERE created_at < ?", (now - self.ttl,))
+        db.execute(
+            "DELETE FROM review_cache WHERE key IN ("
+            "SELECT key FROM review_cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,),
+        )
+
+    def _connect(self):
+        if self._db is None:
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS review_cache ("
+                "key TEXT PRIMARY KEY, repo TEXT NOT NULL, pr_number INTEGER NOT NULL, "
+                "head_sha TEXT NOT NULL, model TEXT NOT NULL, prompt_hash TEXT NOT NULL, "
+                "review TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+            )
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_review_cache_accessed ON review_cache (accessed_at)")
+            self._db.execute("CREATE INDEX IF NOT EXISTS idx_review_cache_pr ON review_cache (repo, pr_number, created_at)")
+            self._db.commit()
+            logging.info(f"✅ Opened review cache at {self.path}")
+        return self._db
+
+
+review_cache = ReviewCache(REVIEW_CACHE_PATH, REVIEW_CACHE_TTL, REVIEW_CACHE_MAX_ENTRIES)
@@ -0,0 +1,211 @@
+import json
+import logging
+import threading
+import time
+from app.config import repo, DEFAULT_REPO, REVIEW_FAST_PATH, FAST_PATH_MAX_FILES, REVIEW_MAP_REDUCE
+from .analyze import (
+    PROMPT_HASH, PROMPT_TEMPLATE, REVIEW_SYSTEM_PROMPT, find_cached_review, build_prompt, store_review, fast_path_key,
+    check_fast_path, diff_token_budget,
+)
+from .fastpath import fast_path_review, FAST_PATH_PROMPT_HASH, FAST_PATH_MODEL
+from .llm import model_resolver, chat, chat_messages, INTERACTIVE
+from .mapreduce import map_reduce_review, MAP_REDUCE_PROMPT_HASH
+from .review_cache import review_cache
+from .diffpack import estimate_pr_tokens
+from .diffstream import pr_files, load_pr_files
+from .dedupe import review_flights
+from .metrics import token_usage
+
+
+# Time-to-first-token of streamed reviews
+class StreamStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._streams = 0
+        self._cached = 0
+        self._ttfb_total = 0.0
+        self._ttfb_max = 0.0
+        self._ttfb_last = None
+
+    def record(self, ttfb, cached):
+        with self._lock:
+            self._streams += 1
+            self._cached += int(cached)
+            self._ttfb_total += ttfb
+            self._ttfb_max = max(self._ttfb_max, ttfb)
+            self._ttfb_last = ttfb
+
+    def stats(self):
+        with self._lock:
+            return {
+                "streams": self._streams,
+                "cached": self._cached,
+                "avg_ttfb": round(self._ttfb_total / self._streams, 3) if self._streams else 0.0,
+                "max_ttfb": round(self._ttfb_max, 3),
+                "last_ttfb": round(self._ttfb_last, 3) if self._ttfb_last is not None else None,
+            }
+
+
+stream_stats = StreamStats()
+
+
+def _event(name, data):
+    return f"event: {name}\ndata: {json.dumps(data)}\n\n"
+
+
+def _whole_review(pr_number, review, started, ttfb, **extra):
+    # Reviews that aren't generated token by token go out in one token event
+    yield _event("token", {"content": review})
+    yield _event("done", {
+        "pr_number": pr_number,
+        "review": review,
+        **extra,
+        "ttfb": round(ttfb, 3),
+        "duration": round(time.perf_counter() - started, 3)
+    })
+
+
+# Same review as analyze_pr, sent as Server-Sent Events while Ollama generates it.
+# Map-reduce reviews of PRs too big for one prompt can't be streamed; they are
+# sent whole once the reduce step finishes.
+def stream_review(pr_number, force=False, repo_name=None):
+    started = time.perf_counter()
+
+    try:
+        repo_name = repo_name or DEFAULT_REPO
+        pr = repo(repo_name).get_pull(pr_number)
+        model_to_use = model_resolver.resolve()
+        yield _event("start", {"repo": repo_name, "pr_number": pr_number, "model": model_to_use})
+
+        # Shares one run with other streams, webhook jobs and merges reviewing the same head;
+        # a stream that joins midway gets the events sent so far, then the rest
+        events = review_flights.stream((repo_name, pr_number, pr.head.sha, force), _stream_review,
+                                       pr_number, pr, repo_name, model_to_use, force, started)
+        relayed = False
+        try:
+            while True:
+                try:
+                    event = next(events)
+                except StopIteration as stop:
+                    review = stop.value
+                    break
+                relayed = True
+                yield event
+        finally:
+            events.close()
+        if relayed:
+            return
+
+        # Joined a review analyze_pr is running for a webhook job or a merge: it arrives whole
+        if review.startswith("Error"):
+            yield _event("error", {"error": review})
+            return
+        yield from _whole_review(pr_number, review, started, time.perf_counter() - started, cached=False, shared=True)
+
+    except Exception as e:
+        logging.error(f"❌ Error streaming review for PR #{pr_number}: {e}")
+        yield _event("error", {"error": str(e)})
+
+
+# Yields the review's events and returns the review (or an error message, like analyze_pr)
+def _stream_review(pr_number, pr, repo_name, model_to_use, force, started):
+    ttfb = None
+
+    try:
+        cache_key = review_cache.make_key(repo_name, pr_number, pr.head.sha, model_to_use, PROMPT_HASH)
+        cached_review = None if force else find_cached_review(repo_name, pr_number, pr, model_to_use)
+        if cached_review is not None:
+            ttfb = time.perf_counter() - started
+            stream_stats.record(ttfb, cached=True)
+            yield from _whole_review(pr_number, cached_review, started, ttfb, cached=True)
+            return cached_review
+
+        if not pr.changed_files:
+            logging.warning(f"⚠️ PR #{pr_number} has no file changes.")
+            yield _event("done", {"pr_number": pr_number, "review": "No file changes detected in this PR.", "cached": False})
+            return "No file changes detected in this PR."
+
+        # Trivial PRs get the templated review in one event instead of a model call
+        files = None
+        if REVIEW_FAST_PATH and pr.changed_files <= FAST_PATH_MAX_FILES:
+            files = list(pr.get_files())
+            match = check_fast_path(files)
+            if match:
+                review_content = fast_path_review(match)
+                ttfb = time.perf_counter() - started
+                stream_stats.record(ttfb, cached=False)
+                store_review(fast_path_key(repo_name, pr_number, pr), repo_name, pr_number, pr, FAST_PATH_MODEL, review_content,
+                             FAST_PATH_PROMPT_HASH, latency=ttfb)
+                yield from _whole_review(pr_number, review_content, started, ttfb, cached=False, fast_path=match[0])
+                return review_content
+
+        # Too big for one prompt: same map-reduce review as analyze_pr
+        description = pr.body if pr.body else 'No description provided'
+        budget = diff_token_budget(model_to_use, REVIEW_SYSTEM_PROMPT, PROMPT_TEMPLATE, pr.title, description)
+        oversized = pr.changed_files > 1 and estimate_pr_tokens(pr) > budget
+        if REVIEW_MAP_REDUCE and oversized:
+            files = files if files is not None else load_pr_files(repo_name, pr)
+            review_content, error, usage = map_reduce_review(
+                pr_number, pr, files, model_to_use, priority=INTERACTIVE, tenant=(repo_name, pr.user.login)
+            )
+            if error:
+                yield _event("error", {"error": error})
+                return error
+            ttfb = time.perf_counter() - started
+            stream_stats.record(ttfb, cached=False)
+            map_reduce_key = review_cache.make_key(repo_name, pr_number, pr.head.sha, model_to_use, MAP_REDUCE_PROMPT_HASH)
+            store_review(map_reduce_key, repo_name, pr_number, pr, model_to_use, review_content, MAP_REDUCE_PROMPT_HASH,
+                         latency=ttfb, usage=usage)
+            yield from _whole_review(pr_number, review_content, started, ttfb, cached=False, map_reduce=True)
+            return review_content
+
+        prompt = build_prompt(pr_number, pr, files if files is not None else pr_files(repo_name, pr), model_to_use)
+        logging.info(f"Streaming review from Ollama for PR #{pr_number}")
+
+        chunks = []
+        usage = None
+        for chunk in chat(
+            model=model_to_use,
+            messages=chat_messages(REVIEW_SYSTEM_PROMPT, prompt),
+            options={"timeout": 120},
+            stream=True,
+            priority=INTERACTIVE,
+            tenant=(repo_name, pr.user.login)
+        ):
+            if chunk.get("done"):
+                usage = token_usage(chunk)
+            content = chunk["message"]["content"]
+            if not content:
+                continue
+            if ttfb is None:
+                ttfb = time.perf_counter() - started
+                stream_stats.record(ttfb, cached=False)
+                logging.info(f"First token for PR #{pr_number} after {ttfb:.2f}s")
+            chunks.append(content)
+            yield _event("token", {"content": content})
+
+        review_content = "".join(chunks)
+        if not review_content:
+            logging.error("Ollama returned empty content")
+            yield _event("error", {"error": "Ollama returned empty content"})
+            return "Error: Ollama returned empty content"
+
+        logging.info(f"✅ Streamed review for PR #{pr_number}: {review_content[:100]}...")
+        store_review(cache_key, repo_name, pr_number, pr, model_to_use, review_content,
+                     latency=time.perf_counter() - started, usage=usage)
+
+        yield _event("done", {
+            "pr_number": pr_number,
+            "review": review_content,
+            "cached": False,
+            # With map-reduce off, a diff over the budget was cut to fit the prompt
+            "truncated": oversized,
+            "ttfb": round(ttfb, 3),
+            "duration": round(time.perf_counter() - started, 3)
+        })
+        return review_content
+
+    except Exception as e:
+        logging.error(f"❌ Error streaming review for PR #{pr_number}: {e}")
+        yield _event("error", {"error": str(e)})
+        return f"Error analyzing PR: {e}"
@@ -0,0 +1,138 @@
+import logging
+import threading
+import time
+
+from app.config import repo, repositories, MERGE_SWEEP_INTERVAL
+from .analyze import analyze_pr
+from .automerge import auto_merge_pr
+from .graphql import list_merge_states
+from .llm import BACKGROUND
+from .prstore import pr_store
+
+
+# Approved, green, mergeable and not a draft: only these PRs get a review and a merge attempt
+def eligible(state):
+    return (
+        not state["draft"]
+        and state["mergeable"] is True
+        and state["approvals"] >= 1
+        and state["combined_status"] == "success"
+    )
+
+
+# Auto-merges eligible PRs of every served repository on an interval. The gate
+# state of all open PRs comes from one paginated GraphQL query per repository,
+# so only the PRs that pass it cost REST calls (PR fetch and merge). A head the
+# sweeper already merged or turned down on a gate isn't tried again until new
+# commits land; merges that failed on an error are retried on the next sweep.
+class MergeSweeper:
+    def __init__(self, interval):
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._sweep_lock = threading.Lock()
+        self._settled = {}
+        self._thread = None
+        self._sweeps = 0
+        self._merged = 0
+        self._last = None
+        self._last_at = None
+
+    def start(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._loop, name="merge-sweeper", daemon=True)
+            self._thread.start()
+        logging.info(f"✅ Merge sweeper running every {self.interval}s")
+
+    # One pass over every served repository; also run on demand by /api/merge-sweep
+    def sweep(self):
+        with self._sweep_lock:
+            started = time.perf_counter()
+            summary = {"repos": 0, "prs": 0, "eligible": 0, "merged": [], "declined": [], "errors": []}
+            for repo_name in repositories():
+                try:
+                    self._sweep_repo(repo_name, summary)
+                except Exception as e:
+                    logging.error(f"❌ Merge sweep of {repo_name} failed: {e}")
+                    summary["errors"].append({"repo": repo_name, "error": str(e)})
+            summary["duration"] = round(time.perf_counter() - started, 3)
+
+        with self._lock:
+            self._sweeps += 1
+            self._merged += len(summary["merged"])
+            self._last = summary
+            self._last_at = time.time()
+        logging.info(f"✅ Merge sweep checked {summary['prs']} open PR(s) in {summary['duration']}s: "
+                     f"{summary['eligible']} eligible, {len(summary['merged'])} merged")
+        return summary
+
+    def stats(self):
+        with self._lock:
+            return {
+                "interval": self.interval,
+                "running": self._thread is not None,
+                "sweeps": self._sweeps,
+                "merged": self._merged,
+                "settled_heads": len(self._settled),
+                "last_sweep_ago": round(time.time() - self._last_at, 1) if self._last_at else None,
+                "last": self._last,
+            }
+
+    def _loop(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logging.error(f"❌ Merge sweep failed: {e}")
+
+    def _sweep_repo(self, repo_name, summary):
+        states = list_merge_states(repo_name)
+        # The same query lists every open PR, so the PR store gets a fresh listing for free
+        pr_store.bootstrap(repo_name, states)
+        summary["repos"] += 1
+        summary["prs"] += len(states)
+
+        open_prs = {state["number"] for state in states}
+        with self._lock:
+            for key in [key for key in self._settled if key[0] == repo_name and key[1] not in open_prs]:
+                del self._settled[key]
+
+        for state in states:
+            key = (repo_name, state["number"])
+            with self._lock:
+                settled = self._settled.get(key) == state["head_sha"]
+            if settled or not eligible(state):
+                continue
+            summary["eligible"] += 1
+            try:
+                self._merge(repo_name, state, summary)
+            except Exception as e:
+                logging.error(f"❌ Merge sweep of {repo_name}#{state['number']} failed: {e}")
+                summary["errors"].append({"repo": repo_name, "pr_number": state["number"], "error": str(e)})
+
+    def _merge(self, repo_name, state, summary):
+        pr_number = state["number"]
+        pr = repo(repo_name).get_pull(pr_number)
+        review = analyze_pr(pr_number, pr=pr, repo_name=repo_name, priority=BACKGROUND)
+        if review.startswith("Error"):
+            # Ollama or GitHub trouble: try this head again on the next sweep
+            summary["errors"].append({"repo": repo_name, "pr_number": pr_number, "error": review})
+            return
+
+        success, message, _, retry = auto_merge_pr(pr_number, review, pr=pr, repo_name=repo_name, state=state)
+        if retry:
+            # GitHub error or a base branch that moved under the merge: try this head again on the next sweep
+            summary["errors"].append({"repo": repo_name, "pr_number": pr_number, "error": message})
+            return
+
+        with self._lock:
+            self._settled[(repo_name, pr_number)] = state["head_sha"]
+        if success:
+            summary["merged"].append({"repo": repo_name, "pr_number": pr_number})
+        else:
+            summary["declined"].append({"repo": repo_name, "pr_number": pr_number, "message": message})
+
+
+merge_sweeper = MergeSweeper(MERGE_SWEEP_INTERVAL)
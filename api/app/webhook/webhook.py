@@ -4,19 +4,55 @@ import json
 from github import Github
 from flask import Flask, request, jsonify
 from ..utils.discord import send_discord_notification
-from ..utils.analyze import analyze_pr
-from app.config import repo
+from ..utils.analyze import analyze_pr, analyze_pr_incremental
+from ..utils.jobs import review_jobs, QueueFullError
+from ..utils.prstore import pr_store
+from ..utils.dedupe import webhook_deliveries
+from app.config import DEFAULT_REPO, is_served
+
+
+def review_job(pr_number, pr_title, pr_user, pr_url, repo_name=DEFAULT_REPO):
+    # Notify Discord about new PR
+    send_discord_notification(
+        title=f"🔄 New PR: #{pr_number} - {pr_title}",
+        description=f"A new pull request is ready for review",
+        color=0x5865F2,  # Discord Blurple
+        fields=[
+            {"name": "Repository", "value": repo_name, "inline": True},
+            {"name": "Author", "value": pr_user, "inline": True},
+            {"name": "Link", "value": pr_url, "inline": False}
+        ]
+    )
+
+    # Auto-review the PR
+    return analyze_pr(pr_number, repo_name=repo_name)
+
 
 class Webhook:
+    @staticmethod
     def github_webhook():
         # Get the event type
         event_type = request.headers.get("X-GitHub-Event")
         
         if not event_type:
             return jsonify({"error": "Not a GitHub webhook event"}), 400
+
+        # GitHub redelivers on timeouts and manual retries; drop events already accepted
+        delivery_id = request.headers.get("X-GitHub-Delivery")
+        if delivery_id and webhook_deliveries.seen(delivery_id):
+            logging.info(f"Dropping redelivered webhook {delivery_id}")
+            return jsonify({"status": "duplicate", "message": f"Delivery {delivery_id} already processed"}), 200
         
         try:
-            data = request.json
+            data = request.json or {}
+
+            # Route by the repository the event came from
+            repo_name = (data.get("repository") or {}).get("full_name") or DEFAULT_REPO
+            if not is_served(repo_name):
+                return jsonify({"status": "ignored", "message": f"Repository {repo_name} is not served"}), 200
+
+            # Every event keeps the in-memory PR state current, reviewed or not
+            pr_store.apply_event(repo_name, event_type, data)
             
             # Handle pull request events
             if event_type == "pull_request":
@@ -28,33 +64,55 @@ class Webhook:
                 
                 # Handle PR opened or reopened events
                 if action in ["opened", "reopened", "ready_for_review"]:
-                    # Notify Discord about new PR
                     pr_title = data.get("pull_request", {}).get("title", "Unknown PR")
                     pr_user = data.get("pull_request", {}).get("user", {}).get("login", "Unknown User")
                     pr_url = data.get("pull_request", {}).get("html_url", "#")
-                    
-                    send_discord_notification(
-                        title=f"🔄 New PR: #{pr_number} - {pr_title}",
-                        description=f"A new pull request is ready for review",
-                        color=0x5865F2,  # Discord Blurple
-                        fields=[
-                            {"name": "Repository", "value": f"{repo.ORG_NAME}/{repo.REPO_NAME}", "inline": True},
-                            {"name": "Author", "value": pr_user, "inline": True},
-                            {"name": "Link", "value": pr_url, "inline": False}
-                        ]
-                    )
-                    
-                    # Auto-review the PR
-                    review = analyze_pr(pr_number)
-                    
+                    head_sha = data.get("pull_request", {}).get("head", {}).get("sha")
+
+                    # Review in the background so GitHub gets its response well within the delivery timeout.
+                    # opened and ready_for_review often arrive together; one job covers both.
+                    try:
+                        job = review_jobs.submit(
+                            "review", review_job, pr_number, pr_title, pr_user, pr_url, repo_name,
+                            shard=repo_name, key=(repo_name, pr_number, head_sha)
+                        )
+                    except QueueFullError as e:
+                        logging.warning(f"⚠️ Dropping review of PR #{pr_number}: {e}")
+                        webhook_deliveries.forget(delivery_id)
+                        return jsonify({"error": str(e)}), 503
+
+                    return jsonify({
+                        "status": "queued",
+                        "message": (
+                            f"Review of {repo_name}#{pr_number} already queued" if job.get("duplicate")
+                            else f"Queued review for {action} event on {repo_name}#{pr_number}"
+                        ),
+                        "job_id": job["id"],
+                        "job_url": f"/api/jobs/{job['id']}"
+                    }), 202
+
+                # New commits pushed: review only what changed since the last review
+                if action == "synchronize":
+                    try:
+                        job = review_jobs.submit(
+                            "incremental_review", analyze_pr_incremental, pr_number, repo_name=repo_name,
+                            shard=repo_name, key=(repo_name, pr_number, data.get("after"))
+                        )
+                    except QueueFullError as e:
+                        logging.warning(f"⚠️ Dropping re-review of PR #{pr_number}: {e}")
+                        webhook_deliveries.forget(delivery_id)
+                        return jsonify({"error": str(e)}), 503
+
                     return jsonify({
-                        "status": "success", 
-                        "message": f"Processed {action} event for PR #{pr_number}",
-                        "review": review
-                    })
+                        "status": "queued",
+                        "message": f"Queued incremental review for {repo_name}#{pr_number} at {data.get('after', 'unknown')[:7]}",
+                        "job_id": job["id"],
+                        "job_url": f"/api/jobs/{job['id']}"
+                    }), 202
                     
-            return jsonify({"status": "ignored", "message": f"Event {event_type} ignored"})
+            return jsonify({"status": "ignored", "message": f"Event {event_type} ignored"}), 200
             
         except Exception as e:
             logging.error(f"❌ Error processing webhook: {e}")
+            webhook_deliveries.forget(delivery_id)
             return jsonify({"error": str(e)}), 500
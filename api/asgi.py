@@ -0,0 +1,27 @@
+"""
+asgi.py serves the Flask app on an ASGI server (uvicorn asgi:app)
+"""
+
+from a2wsgi import WSGIMiddleware
+
+from app import create_app
+from app.config import ASGI_FAST_WORKERS, ASGI_SLOW_WORKERS
+
+# Routes that wait on Ollama; everything else answers from memory or a quick GitHub call
+SLOW_PREFIXES = ("/api/review-pr/", "/api/review-prs", "/api/merge-pr/", "/api/merge-sweep")
+
+flask_app = create_app()
+
+# The same Flask app behind two thread pools. Slow review/merge requests get their
+# own, so a few long LLM round trips can't hold the threads the health check,
+# listing and job polling need; requests beyond a pool's size wait on the loop.
+fast_app = WSGIMiddleware(flask_app, workers=ASGI_FAST_WORKERS)
+slow_app = WSGIMiddleware(flask_app, workers=ASGI_SLOW_WORKERS)
+
+
+async def app(scope, receive, send):
+    if scope["type"] == "http" and scope["path"].startswith(SLOW_PREFIXES):
+        await slow_app(scope, receive, send)
+    else:
+        # Lifespan events and everything quick
+        await fast_app(scope, receive, send)
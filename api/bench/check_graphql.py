@@ -0,0 +1,68 @@
+"""
+Checks graphql.list_open_prs against the fake GitHub's /graphql route: pagination
+past one 100-PR page, UNKNOWN and CONFLICTING mergeable states, and deleted authors.
+
+    cd api && python -m bench.check_graphql
+"""
+
+import os
+import sys
+
+from .fakes import FakeGitHub
+
+REPO = "bench/repo"
+PRS = 130
+
+
+def main():
+    github = FakeGitHub(REPO, prs=PRS).start()
+    github.node_overrides = {
+        5: {"mergeable": "UNKNOWN"},
+        6: {"mergeable": "CONFLICTING"},
+        7: {"author": None},
+    }
+
+    # Config is read at import time, so point the app at the fake before importing it
+    os.environ.update({
+        "GITHUB_TOKEN": "bench-token",
+        "GITHUB_API_URL": github.url,
+        "GITHUB_REPOS": REPO,
+        "ORG_NAME": REPO.split("/")[0],
+        "REPO_NAME": REPO.split("/")[1],
+    })
+
+    from app.utils.graphql import list_open_prs
+
+    failures = []
+
+    def check(condition, message):
+        if not condition:
+            failures.append(message)
+
+    try:
+        calls_before = github.calls
+        prs = list_open_prs(REPO)
+        calls = github.calls - calls_before
+    finally:
+        github.stop()
+
+    by_number = {pr["number"]: pr for pr in prs}
+    check([pr["number"] for pr in prs] == list(range(PRS, 0, -1)), f"expected PRs {PRS}..1 newest first, got {len(prs)} PR(s)")
+    check(calls == 2, f"expected 2 GraphQL requests for {PRS} PRs, made {calls}")
+    check(by_number.get(5, {}).get("mergeable", False) is None, "UNKNOWN mergeable should map to None")
+    check(by_number.get(6, {}).get("mergeable") is False, "CONFLICTING mergeable should map to False")
+    check(by_number.get(1, {}).get("mergeable") is True, "MERGEABLE mergeable should map to True")
+    check(by_number.get(7, {}).get("user") == "ghost", "a PR without an author should list the user as ghost")
+    check(by_number.get(8, {}).get("user") == "dev1", "a PR's author login should be listed as its user")
+    check(by_number.get(1, {}).get("created_at") == "2023-11-14T22:14:20+00:00", "timestamps should match the REST serialization")
+
+    for message in failures:
+        print(f"❌ {message}", file=sys.stderr)
+    if failures:
+        return 1
+    print(f"✅ list_open_prs returned {len(prs)} PRs in {calls} GraphQL request(s)", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
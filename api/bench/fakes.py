@@ -0,0 +1,347 @@
+import hashlib
+import json
+import re
+import threading
+import time
+from functools import lru_cache
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlencode, urlparse, parse_qs
+
+# Filler for generated reviews; kept clear of the words the merge gate rejects
+REVIEW_WORDS = ("the", "change", "updates", "handler", "logic", "and", "tests", "look", "consistent", "with", "the", "module")
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle on, keep-alive requests stall on delayed ACKs
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        self.server.dispatch(self, "GET")
+
+    def do_POST(self):
+        self.server.dispatch(self, "POST")
+
+    def do_PUT(self):
+        self.server.dispatch(self, "PUT")
+
+    def log_message(self, format, *args):
+        pass
+
+
+# A local HTTP server that waits `latency` seconds before answering each request
+class FakeServer(ThreadingHTTPServer):
+    daemon_threads = True
+    routes = ()
+
+    def __init__(self, latency=0.0):
+        super().__init__(("127.0.0.1", 0), _Handler)
+        self.latency = latency
+        self.calls = 0
+        self._lock = threading.Lock()
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.serve_forever, name=type(self).__name__, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+    def dispatch(self, handler, method):
+        with self._lock:
+            self.calls += 1
+        parsed = urlparse(handler.path)
+        length = int(handler.headers.get("Content-Length") or 0)
+        body = handler.rfile.read(length) if length else b""
+        if self.latency:
+            time.sleep(self.latency)
+        for route_method, pattern, name in self.routes:
+            match = re.fullmatch(pattern, parsed.path)
+            if route_method == method and match:
+                query = {key: values[0] for key, values in parse_qs(parsed.query).items()}
+                return getattr(self, name)(handler, query, body, *match.groups())
+        self.send(handler, 404, {"message": "Not Found"})
+
+    @staticmethod
+    def send(handler, status, payload=None, content_type="application/json", headers=None):
+        data = b"" if payload is None else payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(data)
+
+
+def _timestamp(offset):
+    return time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime(1700000000 + offset * 60))
+
+
+# GitHub REST (PyGithub's shapes), GraphQL and the diff media type for one
+# repository of `prs` open PRs, each changing `diff_files` files of `diff_lines` lines
+class FakeGitHub(FakeServer):
+    routes = (
+        ("POST", r"/graphql", "graphql"),
+        ("GET", r"/repos/([^/]+/[^/]+)", "repository"),
+        ("GET", r"/repos/([^/]+/[^/]+)/pulls", "pulls"),
+        ("GET", r"/repos/([^/]+/[^/]+)/pulls/(\d+)", "pull"),
+        ("GET", r"/repos/([^/]+/[^/]+)/pulls/(\d+)/files", "files"),
+        ("GET", r"/repos/([^/]+/[^/]+)/pulls/(\d+)/reviews", "reviews"),
+        ("PUT", r"/repos/([^/]+/[^/]+)/pulls/(\d+)/merge", "merge"),
+        ("GET", r"/repos/([^/]+/[^/]+)/commits/([^/]+)", "commit"),
+        ("GET", r"/repos/([^/]+/[^/]+)/commits/([^/]+)/status", "status"),
+        ("GET", r"/repos/([^/]+/[^/]+)/commits/([^/]+)/check-runs", "check_runs"),
+        ("GET", r"/repos/([^/]+/[^/]+)/actions/runs", "workflow_runs"),
+    )
+
+    def __init__(self, repo="bench/repo", prs=10, diff_files=5, diff_lines=20, latency=0.0):
+        super().__init__(latency)
+        self.repo = repo
+        # number -> GraphQL node fields to replace, for PRs that need to look unusual
+        self.node_overrides = {}
+        self.configure(prs, diff_files, diff_lines)
+
+    def configure(self, prs, diff_files, diff_lines):
+        self.prs = prs
+        self.diff_files = diff_files
+        self.diff_lines = diff_lines
+
+    def sha(self, number):
+        # Changes with the diff size so reviews of a new scenario aren't served from the cache
+        return hashlib.sha1(f"{number}:{self.diff_files}:{self.diff_lines}".encode()).hexdigest()
+
+    def send(self, handler, status, payload=None, content_type="application/json", headers=None):
+        # Real GitHub sends ETags, so the client's conditional cache gets exercised too
+        headers = dict(headers or {})
+        data = payload if isinstance(payload, bytes) else json.dumps(payload).encode() if payload is not None else b""
+        if status == 200 and handler.command == "GET":
+            etag = '"' + hashlib.sha1(data).hexdigest() + '"'
+            headers["ETag"] = etag
+            if handler.headers.get("If-None-Match") == etag:
+                return super().send(handler, 304, headers=headers)
+        headers.setdefault("X-RateLimit-Limit", "5000")
+        headers.setdefault("X-RateLimit-Remaining", "4999")
+        headers.setdefault("X-RateLimit-Reset", str(int(time.time()) + 3600))
+        headers.setdefault("X-RateLimit-Resource", "graphql" if handler.path == "/graphql" else "core")
+        super().send(handler, status, data, content_type, headers)
+
+    def paginate(self, handler, query, items, key=None):
+        page = int(query.get("page", 1))
+        per_page = int(query.get("per_page", 30))
+        chunk = items[(page - 1) * per_page:page * per_page]
+        headers = {}
+        if page * per_page < len(items):
+            next_query = urlencode({**query, "page": page + 1, "per_page": per_page})
+            headers["Link"] = f'<{self.url}{urlparse(handler.path).path}?{next_query}>; rel="next"'
+        payload = {"total_count": len(items), key: chunk} if key else chunk
+        self.send(handler, 200, payload, headers=headers)
+
+    def _user(self, number):
+        login = f"dev{number % 7}"
+        return {"login": login, "id": number % 7 + 1, "type": "User", "url": f"{self.url}/users/{login}"}
+
+    def _repo(self, full_name):
+        owner, name = full_name.split("/", 1)
+        return {
+            "id": 1, "name": name, "full_name": full_name, "archived": False, "private": False,
+            "owner": {"login": owner, "id": 1, "type": "Organization", "url": f"{self.url}/users/{owner}"},
+            "url": f"{self.url}/repos/{full_name}", "default_branch": "main",
+        }
+
+    def _pull(self, full_name, number):
+        return {
+            "id": number, "number": number, "state": "open", "title": f"Change {number}",
+            "body": f"Benchmark PR {number}", "user": self._user(number),
+            "head": {"sha": self.sha(number), "ref": f"feature-{number}", "repo": self._repo(full_name)},
+            "base": {"sha": "0" * 40, "ref": "main", "repo": self._repo(full_name)},
+            "changed_files": self.diff_files, "additions": self.diff_files * self.diff_lines,
+            "deletions": self.diff_files * self.diff_lines // 4,
+            "mergeable": True, "mergeable_state": "clean", "merged": False,
+            "created_at": _timestamp(number), "updated_at": _timestamp(number + 1),
+            "url": f"{self.url}/repos/{full_name}/pulls/{number}",
+            "html_url": f"https://github.com/{full_name}/pull/{number}",
+        }
+
+    def _known(self, handler, number):
+        if not 1 <= int(number) <= self.prs:
+            self.send(handler, 404, {"message": "Not Found"})
+            return False
+        return True
+
+    def repository(self, handler, query, body, full_name):
+        self.send(handler, 200, self._repo(full_name))
+
+    def pulls(self, handler, query, body, full_name):
+        self.paginate(handler, query, [self._pull(full_name, n) for n in range(self.prs, 0, -1)])
+
+    def pull(self, handler, query, body, full_name, number):
+        if not self._known(handler, number):
+            return
+        if "diff" in handler.headers.get("Accept", ""):
+            return self.send(handler, 200, _diff(self.diff_files, self.diff_lines).encode(), "text/plain; charset=utf-8")
+        self.send(handler, 200, self._pull(full_name, int(number)))
+
+    def files(self, handler, query, body, full_name, number):
+        if not self._known(handler, number):
+            return
+        patch = _patch(self.diff_lines)
+        self.paginate(handler, query, [{
+            "sha": f"{i:040x}", "filename": _filename(i), "status": "modified",
+            "additions": self.diff_lines, "deletions": self.diff_lines // 4,
+            "changes": self.diff_lines + self.diff_lines // 4, "patch": patch,
+        } for i in range(self.diff_files)])
+
+    def reviews(self, handler, query, body, full_name, number):
+        self.paginate(handler, query, [{
+            "id": 1, "state": "APPROVED", "user": {"login": "reviewer", "id": 99, "type": "User"},
+            "commit_id": self.sha(int(number)), "submitted_at": _timestamp(int(number) + 2),
+        }])
+
+    def merge(self, handler, query, body, full_name, number):
+        # PRs stay open so the same set can be merged again on the next iteration
+        self.send(handler, 200, {"sha": self.sha(int(number)), "merged": True, "message": "Pull Request successfully merged"})
+
+    def commit(self, handler, query, body, full_name, sha):
+        self.send(handler, 200, {"sha": sha, "url": f"{self.url}/repos/{full_name}/commits/{sha}", "commit": {"message": "bench"}})
+
+    def status(self, handler, query, body, full_name, sha):
+        self.send(handler, 200, {
+            "state": "success", "sha": sha, "total_count": 1,
+            "statuses": [{"id": 1, "state": "success", "context": "ci/bench", "description": "passed"}],
+        })
+
+    def check_runs(self, handler, query, body, full_name, sha):
+        self.paginate(handler, query, [
+            {"id": 1, "name": "tests", "status": "completed", "conclusion": "success", "head_sha": sha},
+        ], "check_runs")
+
+    def workflow_runs(self, handler, query, body, full_name):
+        self.paginate(handler, query, [
+            {"id": 1, "name": "CI", "status": "completed", "conclusion": "success", "head_sha": query.get("head_sha")},
+        ], "workflow_runs")
+
+    def _node(self, number):
+        # Superset of the fields the listing and merge-state queries ask for
+        node = {
+            "number": number, "title": f"Change {number}", "author": {"login": self._user(number)["login"]},
+            "createdAt": _timestamp(number), "updatedAt": _timestamp(number + 1), "mergeable": "MERGEABLE",
+            "isDraft": False, "headRefOid": self.sha(number), "reviewDecision": "APPROVED",
+            "latestOpinionatedReviews": {"nodes": [{"state": "APPROVED"}]},
+            "commits": {"nodes": [{"commit": {"statusCheckRollup": {"state": "SUCCESS"}}}]},
+        }
+        node.update(self.node_overrides.get(number, {}))
+        return node
+
+    def graphql(self, handler, query, body):
+        request = json.loads(body or b"{}")
+        variables = request.get("variables", {})
+        if "number" in variables:
+            number = int(variables["number"])
+            node = self._node(number) if 1 <= number <= self.prs else None
+            return self.send(handler, 200, {"data": {"repository": {"pullRequest": node}}})
+        page_size = int(re.search(r"first: (\d+), after", request.get("query", "")).group(1))
+        start = int(variables.get("cursor") or 0)
+        numbers = list(range(self.prs, 0, -1))[start:start + page_size]
+        end = start + len(numbers)
+        self.send(handler, 200, {"data": {"repository": {"pullRequests": {
+            "totalCount": self.prs,
+            "pageInfo": {"hasNextPage": end < self.prs, "endCursor": str(end)},
+            "nodes": [self._node(n) for n in numbers],
+        }}}})
+
+
+def _filename(index):
+    return f"src/module{index % 10}/file{index}.py"
+
+
+@lru_cache(maxsize=8)
+def _patch(lines):
+    removed = lines // 4
+    body = [f"@@ -1,{removed + 3} +1,{lines + 3} @@", " import os", " import sys", " "]
+    body += [f"-    value_{i} = compute({i})" for i in range(removed)]
+    body += [f"+    value_{i} = compute({i}, cache=True)  # benchmark line" for i in range(lines)]
+    return "\n".join(body)
+
+
+@lru_cache(maxsize=8)
+def _diff(files, lines):
+    parts = []
+    for i in range(files):
+        name = _filename(i)
+        parts.append(f"diff --git a/{name} b/{name}\nindex 1111111..2222222 100644\n--- a/{name}\n+++ b/{name}\n{_patch(lines)}")
+    return "\n".join(parts) + "\n"
+
+
+# Ollama's /api/tags and /api/chat. Replies take `latency` seconds to start and
+# then arrive at `tokens_per_second`; each is `review_tokens` words long.
+class FakeOllama(FakeServer):
+    routes = (
+        ("GET", r"/api/tags", "tags"),
+        ("POST", r"/api/chat", "chat"),
+    )
+
+    def __init__(self, model="llama3.2:latest", latency=0.0, tokens_per_second=0.0, review_tokens=150):
+        super().__init__(0.0)
+        self.model = model
+        self.reply_latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.review_tokens = review_tokens
+
+    def tags(self, handler, query, body):
+        self.send(handler, 200, {"models": [{"name": self.model, "model": self.model, "size": 2000000000}]})
+
+    def chat(self, handler, query, body):
+        request = json.loads(body or b"{}")
+        prompt_tokens = sum(len(m.get("content", "")) for m in request.get("messages", [])) // 4
+        words = [REVIEW_WORDS[i % len(REVIEW_WORDS)] for i in range(max(self.review_tokens - 4, 0))]
+        words += ["Verdict:", "SAFE", "TO", "MERGE"]
+        pause = 1 / self.tokens_per_second if self.tokens_per_second else 0.0
+        time.sleep(self.reply_latency)
+        started = time.perf_counter()
+
+        def final(content):
+            eval_duration = max(int((time.perf_counter() - started) * 1e9), 1)
+            return {
+                "model": self.model, "created_at": _timestamp(0), "message": {"role": "assistant", "content": content},
+                "done": True, "done_reason": "stop", "total_duration": eval_duration, "load_duration": 0,
+                "prompt_eval_count": prompt_tokens, "prompt_eval_duration": 1, "eval_count": len(words),
+                "eval_duration": eval_duration,
+            }
+
+        if not request.get("stream", True):
+            time.sleep(pause * len(words))
+            return self.send(handler, 200, final(" ".join(words)))
+
+        handler.send_response(200)
+        handler.send_header("Content-Type", "application/x-ndjson")
+        handler.send_header("Connection", "close")
+        handler.end_headers()
+        handler.close_connection = True
+        for i, word in enumerate(words):
+            time.sleep(pause)
+            chunk = {"model": self.model, "created_at": _timestamp(0), "message": {"role": "assistant", "content": word if i == 0 else " " + word}, "done": False}
+            handler.wfile.write(json.dumps(chunk).encode() + b"\n")
+            handler.wfile.flush()
+        handler.wfile.write(json.dumps(final("")).encode() + b"\n")
+
+
+# Accepts Discord webhook posts and counts the embeds
+class FakeDiscord(FakeServer):
+    routes = (("POST", r"/webhook", "post"),)
+
+    def __init__(self, latency=0.0):
+        super().__init__(latency)
+        self.embeds = 0
+
+    def post(self, handler, query, body):
+        with self._lock:
+            self.embeds += len(json.loads(body or b"{}").get("embeds", []))
+        self.send(handler, 204)
@@ -0,0 +1,219 @@
+"""
+Offline benchmark: runs the real Flask blueprint against local fake GitHub,
+Ollama and Discord servers and reports latency percentiles per endpoint as
+the number of open PRs and the diff size grow.
+
+    cd api && python -m bench.run --prs 10,100,500 --diff-sizes 5x20,50x200 --out bench-results.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from werkzeug.serving import make_server
+
+from .fakes import FakeGitHub, FakeOllama, FakeDiscord
+
+REPO = "bench/repo"
+
+# name -> (method, path for the i-th request against a repository of `prs` PRs, cold).
+# Cold requests drop the in-memory PR store first, as if no webhook had kept it current.
+ENDPOINTS = {
+    "pull-requests": ("GET", lambda i, prs: "/api/pull-requests", False),
+    "pull-requests-cold": ("GET", lambda i, prs: "/api/pull-requests", True),
+    "review-pr": ("GET", lambda i, prs: f"/api/review-pr/{i % prs + 1}?force=true", False),
+    "review-pr-stream": ("GET", lambda i, prs: f"/api/review-pr/{i % prs + 1}/stream?force=true", False),
+    "review-prs": ("GET", lambda i, prs: "/api/review-prs?force=true&prs=" + ",".join(str(n) for n in range(1, min(prs, 10) + 1)), False),
+    "merge-pr": ("POST", lambda i, prs: f"/api/merge-pr/{i % prs + 1}?force=true", False),
+    "merge-sweep": ("POST", lambda i, prs: "/api/merge-sweep", False),
+    "reviews": ("GET", lambda i, prs: "/api/reviews?per_page=50", False),
+}
+
+
+def _csv(cast):
+    return lambda value: [cast(item) for item in value.split(",") if item]
+
+
+def _diff_size(value):
+    files, lines = value.lower().split("x", 1)
+    return int(files), int(lines)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--prs", type=_csv(int), default=[10, 100], help="open PR counts to benchmark (comma-separated)")
+    parser.add_argument("--diff-sizes", type=_csv(_diff_size), default=[(5, 20), (50, 200)],
+                        help="diff sizes as FILESxLINES per PR (comma-separated)")
+    parser.add_argument("--endpoints", type=_csv(str), default=list(ENDPOINTS), help="endpoints to run (comma-separated)")
+    parser.add_argument("--requests", type=int, default=20, help="measured requests per endpoint and scenario")
+    parser.add_argument("--warmup", type=int, default=2, help="unmeasured requests per endpoint and scenario")
+    parser.add_argument("--concurrency", type=int, default=4, help="requests in flight at once")
+    parser.add_argument("--github-latency", type=float, default=0.02, help="seconds added to every GitHub response")
+    parser.add_argument("--ollama-latency", type=float, default=0.2, help="seconds before Ollama starts answering")
+    parser.add_argument("--ollama-tps", type=float, default=200.0, help="tokens per second Ollama generates (0 = instant)")
+    parser.add_argument("--review-tokens", type=int, default=150, help="length of each generated review in tokens")
+    parser.add_argument("--discord-latency", type=float, default=0.05, help="seconds added to every Discord post")
+    parser.add_argument("--out", default="-", help="file for the JSON results ('-' for stdout)")
+    parser.add_argument("--verbose", action="store_true", help="keep the app's INFO logging")
+    args = parser.parse_args(argv)
+    unknown = set(args.endpoints) - set(ENDPOINTS)
+    if unknown:
+        parser.error(f"unknown endpoint(s): {', '.join(sorted(unknown))}; choose from {', '.join(ENDPOINTS)}")
+    return args
+
+
+def percentile(values, p):
+    # Nearest rank on sorted values
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(int(round(p / 100 * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize(latencies, errors, elapsed, github_calls):
+    count = len(latencies)
+    return {
+        "requests": count,
+        "errors": errors,
+        "throughput": round(count / elapsed, 3) if elapsed else None,
+        "mean": round(sum(latencies) / count, 4) if count else None,
+        "p50": round(percentile(latencies, 50), 4) if count else None,
+        "p95": round(percentile(latencies, 95), 4) if count else None,
+        "p99": round(percentile(latencies, 99), 4) if count else None,
+        "max": round(max(latencies), 4) if count else None,
+        "github_calls_per_request": round(github_calls / count, 2) if count else None,
+    }
+
+
+def call(session, base_url, method, path):
+    started = time.perf_counter()
+    response = session.request(method, base_url + path, stream=True, timeout=600)
+    # Streamed endpoints are measured to their last byte
+    for _ in response.iter_content(chunk_size=64 * 1024):
+        pass
+    response.close()
+    return time.perf_counter() - started, response.status_code
+
+
+def run_endpoint(base_url, name, prs, args, github, pr_store):
+    method, path, cold = ENDPOINTS[name]
+    local = threading.local()
+
+    def one(i):
+        if not hasattr(local, "session"):
+            local.session = requests.Session()
+        if cold:
+            pr_store.invalidate()
+        return call(local.session, base_url, method, path(i, prs))
+
+    with ThreadPoolExecutor(max_workers=args.concurrency) as pool:
+        list(pool.map(one, range(args.warmup)))
+        calls_before = github.calls
+        started = time.perf_counter()
+        results = list(pool.map(one, range(args.warmup, args.warmup + args.requests)))
+        elapsed = time.perf_counter() - started
+
+    latencies = [latency for latency, status in results if status < 400]
+    errors = sum(1 for _, status in results if status >= 400)
+    return summarize(latencies, errors, elapsed, github.calls - calls_before)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    github = FakeGitHub(REPO, latency=args.github_latency).start()
+    ollama_server = FakeOllama(latency=args.ollama_latency, tokens_per_second=args.ollama_tps, review_tokens=args.review_tokens).start()
+    discord = FakeDiscord(latency=args.discord_latency).start()
+    workdir = tempfile.mkdtemp(prefix="pr-bench-")
+
+    # Config is read at import time, so point the app at the fakes before importing it
+    os.environ.update({
+        "GITHUB_TOKEN": "bench-token",
+        "GITHUB_API_URL": github.url,
+        "GITHUB_REPOS": REPO,
+        "ORG_NAME": REPO.split("/")[0],
+        "REPO_NAME": REPO.split("/")[1],
+        "OLLAMA_HOST": ollama_server.url,
+        "DISCORD_WEBHOOK_URL": f"{discord.url}/webhook",
+        "REVIEW_CACHE_PATH": os.path.join(workdir, "review_cache.db"),
+        "REVIEW_HISTORY_PATH": os.path.join(workdir, "review_history.db"),
+    })
+    # The fake has no secondary rate limit to respect
+    os.environ.setdefault("GITHUB_SECONDS_BETWEEN_WRITES", "0")
+
+    from app import create_app
+    from app import config
+    from app.utils.prstore import pr_store
+
+    # The app configures logging on import; keep the request and review chatter out of the report
+    if not args.verbose:
+        logging.getLogger().setLevel(logging.ERROR)
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+
+    server = make_server("127.0.0.1", 0, create_app(), threaded=True)
+    threading.Thread(target=server.serve_forever, name="bench-app", daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+
+    scenarios = []
+    try:
+        for prs in args.prs:
+            for diff_files, diff_lines in args.diff_sizes:
+                github.configure(prs, diff_files, diff_lines)
+                pr_store.invalidate()
+                scenario = {"prs": prs, "diff_files": diff_files, "diff_lines": diff_lines, "endpoints": {}}
+                for name in args.endpoints:
+                    result = run_endpoint(base_url, name, prs, args, github, pr_store)
+                    scenario["endpoints"][name] = result
+                    print(
+                        f"prs={prs:<5} diff={diff_files}x{diff_lines:<6} {name:<18} "
+                        f"{result['throughput'] or 0:>8.2f} req/s  p50={result['p50']}  p95={result['p95']}  "
+                        f"p99={result['p99']}  errors={result['errors']}",
+                        file=sys.stderr,
+                    )
+                scenarios.append(scenario)
+    finally:
+        server.shutdown()
+        for fake in (github, ollama_server, discord):
+            fake.stop()
+
+    results = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "environment": {"python": platform.python_version(), "platform": platform.platform()},
+        "settings": {
+            "requests": args.requests,
+            "warmup": args.warmup,
+            "concurrency": args.concurrency,
+            "github_latency": args.github_latency,
+            "ollama_latency": args.ollama_latency,
+            "ollama_tps": args.ollama_tps,
+            "review_tokens": args.review_tokens,
+            "discord_latency": args.discord_latency,
+            "llm_concurrency": config.LLM_CONCURRENCY,
+            "review_num_ctx": config.REVIEW_NUM_CTX,
+            "review_map_reduce": config.REVIEW_MAP_REDUCE,
+            "github_pool_size": config.GITHUB_POOL_SIZE,
+            "pr_store_ttl": config.PR_STORE_TTL,
+            "github_seconds_between_writes": config.GITHUB_SECONDS_BETWEEN_WRITES,
+        },
+        "discord_embeds": discord.embeds,
+        "scenarios": scenarios,
+    }
+    output = json.dumps(results, indent=2)
+    if args.out == "-":
+        print(output)
+    else:
+        with open(args.out, "w") as f:
+            f.write(output + "\n")
+        print(f"Results written to {args.out}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
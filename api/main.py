@@ -6,6 +6,8 @@ import requests
 import json
 from github import Github
 from flask import Flask, request, jsonify
+from app.utils.jobs import JobQueue, QueueFullError
+from app.utils.discord import send_discord_notification
 
 # Configure logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -15,6 +17,8 @@ GITHUB_TOKEN = os.getenv("GITHUB_TOKEN")
 ORG_NAME = os.getenv("ORG_NAME", "stormyy00")
 REPO_NAME = os.getenv("REPO_NAME", "email-automation")
 DISCORD_WEBHOOK_URL = os.getenv("DISCORD_WEBHOOK_URL")
+REVIEW_WORKERS = int(os.getenv("REVIEW_WORKERS", 2))
+REVIEW_QUEUE_SIZE = int(os.getenv("REVIEW_QUEUE_SIZE", 100))
 
 # Initialize Flask app
 app = Flask(__name__)
@@ -37,45 +41,8 @@ except Exception as e:
     logging.error(f"❌ Failed to connect to GitHub: {e}")
     exit(1)
 
-# Function to send Discord notifications
-def send_discord_notification(title, description, color=0x5865F2, fields=None):
-    if not DISCORD_WEBHOOK_URL:
-        logging.warning("Discord notification skipped: No webhook URL configured")
-        return False
-    
-    try:
-        # Create Discord embed
-        embed = {
-            "title": title,
-            "description": description,
-            "color": color,
-            "timestamp": None  # Discord will use current time
-        }
-        
-        # Add fields if provided
-        if fields:
-            embed["fields"] = fields
-        
-        payload = {
-            "embeds": [embed]
-        }
-        
-        response = requests.post(
-            DISCORD_WEBHOOK_URL,
-            data=json.dumps(payload),
-            headers={"Content-Type": "application/json"}
-        )
-        
-        if response.status_code == 204:
-            logging.info(f"✅ Discord notification sent: {title}")
-            return True
-        else:
-            logging.error(f"❌ Discord notification failed: {response.status_code} - {response.text}")
-            return False
-    
-    except Exception as e:
-        logging.error(f"❌ Error sending Discord notification: {e}")
-        return False
+# Webhook reviews run in the background so GitHub isn't kept waiting on Ollama
+review_jobs = JobQueue("review", REVIEW_WORKERS, REVIEW_QUEUE_SIZE, 500)
 
 # Function to analyze PR code using Ollama (Llama 3.2)
 def analyze_pr(pr_number):
@@ -396,6 +363,23 @@ def merge_pr(pr_number):
         "review": review
     })
 
+# Background job run for webhook-triggered reviews
+def review_job(pr_number, pr_title, pr_user, pr_url):
+    # Notify Discord about new PR
+    send_discord_notification(
+        title=f"🔄 New PR: #{pr_number} - {pr_title}",
+        description=f"A new pull request is ready for review",
+        color=0x5865F2,  # Discord Blurple
+        fields=[
+            {"name": "Repository", "value": f"{ORG_NAME}/{REPO_NAME}", "inline": True},
+            {"name": "Author", "value": pr_user, "inline": True},
+            {"name": "Link", "value": pr_url, "inline": False}
+        ]
+    )
+
+    # Auto-review the PR
+    return analyze_pr(pr_number)
+
 # Setup webhook endpoint for GitHub events
 @app.route("/api/webhook", methods=["POST"])
 def github_webhook():
@@ -418,30 +402,22 @@ def github_webhook():
             
             # Handle PR opened or reopened events
             if action in ["opened", "reopened", "ready_for_review"]:
-                # Notify Discord about new PR
                 pr_title = data.get("pull_request", {}).get("title", "Unknown PR")
                 pr_user = data.get("pull_request", {}).get("user", {}).get("login", "Unknown User")
                 pr_url = data.get("pull_request", {}).get("html_url", "#")
-                
-                send_discord_notification(
-                    title=f"🔄 New PR: #{pr_number} - {pr_title}",
-                    description=f"A new pull request is ready for review",
-                    color=0x5865F2,  # Discord Blurple
-                    fields=[
-                        {"name": "Repository", "value": f"{ORG_NAME}/{REPO_NAME}", "inline": True},
-                        {"name": "Author", "value": pr_user, "inline": True},
-                        {"name": "Link", "value": pr_url, "inline": False}
-                    ]
-                )
-                
-                # Auto-review the PR
-                review = analyze_pr(pr_number)
-                
+
+                try:
+                    job = review_jobs.submit("review", review_job, pr_number, pr_title, pr_user, pr_url)
+                except QueueFullError as e:
+                    logging.warning(f"⚠️ Dropping review of PR #{pr_number}: {e}")
+                    return jsonify({"error": str(e)}), 503
+
                 return jsonify({
-                    "status": "success", 
-                    "message": f"Processed {action} event for PR #{pr_number}",
-                    "review": review
-                })
+                    "status": "queued",
+                    "message": f"Queued review for {action} event on PR #{pr_number}",
+                    "job_id": job["id"],
+                    "job_url": f"/api/jobs/{job['id']}"
+                }), 202
                 
         return jsonify({"status": "ignored", "message": f"Event {event_type} ignored"})
         
@@ -449,6 +425,19 @@ def github_webhook():
         logging.error(f"❌ Error processing webhook: {e}")
         return jsonify({"error": str(e)}), 500
 
+# API to poll a queued review job
+@app.route("/api/jobs/<job_id>", methods=["GET"])
+def get_job(job_id):
+    job = review_jobs.get(job_id)
+    if not job:
+        return jsonify({"error": f"Job {job_id} not found"}), 404
+    return jsonify(job)
+
+# API to inspect the review queue
+@app.route("/api/jobs", methods=["GET"])
+def job_stats():
+    return jsonify(review_jobs.stats())
+
 @app.route("/health", methods=["GET"])
 def health_check():
     return jsonify({"status": "healthy"})
@@ -1,6 +1,11 @@
 from app import create_app
+from app.config import SERVER_MODE
 
 app = create_app()
 
 if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000)
\ No newline at end of file
+    if SERVER_MODE == "asgi":
+        import uvicorn
+        uvicorn.run("asgi:app", host="0.0.0.0", port=5000)
+    else:
+        app.run(host="0.0.0.0", port=5000)